@@ -1,61 +1,171 @@
 # app/Dashboard.py
 import streamlit as st
 import duckdb
+import io
+import sys
+from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.figure import Figure
 
-def create_actions_heatmap(df):
-    # Prepare data for heatmap: rows=actions, columns=step (action_rank)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "pipelines"))
+import sync_replica
+
+def create_actions_heatmap(counts, top_n_actions):
+    """
+    Render the step-action counts (activity, action_rank, events) as a
+    heatmap; returns PNG bytes. Uses a standalone Figure, not pyplot's global
+    state, so concurrent sessions can render at once.
+    """
+    # Rows=actions, columns=step (action_rank)
     heatmap_df = (
-        df.groupby(["activity", "action_rank"])
-        .size()
-        .unstack(fill_value=0)
+        counts.pivot(index="activity", columns="action_rank", values="events")
+        .fillna(0)
+        .astype(int)
         .sort_index(axis=1)
     )
 
-    plt.figure(figsize=(top_n_actions * 0.5, 16))  # Increase width based on number of actions
-    sns.heatmap(heatmap_df, cmap="Blues", linewidths=0.5, annot=True, fmt="d", annot_kws={"size":8})
-    plt.xlabel("Build Order Step (action_rank)")
-    plt.ylabel("Action")
-    plt.title("Most Common Actions at Each Build Order Step")
-    plt.xticks(rotation=45, ha='right', fontsize=10)  # Rotate and enlarge x labels
-    plt.yticks(fontsize=10)  # Enlarge y labels
-    st.pyplot(plt)
-    plt.close()
-
-def short_id(id_str, length=8):
-    if len(id_str) > length:
-        return f"{id_str[:length]}…"
-    return id_str
+    # Width from the number of steps, height from the number of actions
+    fig = Figure(figsize=(top_n_actions * 0.5, max(len(heatmap_df) * 0.5, 4)))
+    ax = fig.subplots()
+    sns.heatmap(heatmap_df, cmap="Blues", linewidths=0.5, annot=True, fmt="d", annot_kws={"size":8}, ax=ax)
+    ax.set_xlabel("Build Order Step (action_rank)")
+    ax.set_ylabel("Action")
+    ax.set_title("Most Common Actions at Each Build Order Step")
+    ax.tick_params(axis="x", labelrotation=45, labelsize=10)  # Rotate and enlarge x labels
+    ax.tick_params(axis="y", labelsize=10)  # Enlarge y labels
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+def short_id_sql(column, length=8):
+    """SQL expression shortening an id column to `length` characters plus an ellipsis."""
+    return f"CASE WHEN LENGTH({column}) > {length} THEN LEFT({column}, {length}) || '…' ELSE {column} END"
 
 # ----------------------------------------
 # 1️⃣ Connect to DuckDB
 # ----------------------------------------
 
-md_token = st.secrets["MOTHERDUCK_TOKEN"]
+# Cached query results expire after this many seconds even without a refresh
+QUERY_TTL_SECONDS = 600
+# How often the warehouse refresh stamp is re-read
+VERSION_TTL_SECONDS = 30
+# Elo bucket width of gold.elo_cube
+ELO_BUCKET = 100
+# Activities (rows) shown in the step-action heatmap
+HEATMAP_TOP_ACTIVITIES = 25
+# Rows per page of the player-level tables
+PAGE_SIZE = 200
 
-con = duckdb.connect(f"md:?motherduck_token={md_token}")
-if con is None:
-    print("Failed to connect to MotherDuck Database, using local database instead.")
-    con = duckdb.connect(database="warehouse/aoe.duckdb", read_only=True)
+# Replica mode (secret REPLICA_MODE = true): queries are served from a local
+# snapshot of the gold tables, the remote is only read to sync it
+REPLICA_SYNC_SECONDS = 300
 
-else:
-    con.execute("USE aoe;")
+@st.cache_data(ttl=REPLICA_SYNC_SECONDS, show_spinner=False)
+def replica_snapshot():
+    """
+    Path of the local replica snapshot, synced when the remote's warehouse
+    version changed; None outside replica mode. A failed sync keeps serving
+    the last snapshot.
+    """
+    if not st.secrets.get("REPLICA_MODE", False):
+        return None
+    try:
+        remote = sync_replica.connect_warehouse(st.secrets["MOTHERDUCK_TOKEN"], read_only=True)
+        try:
+            return str(sync_replica.sync_replica(remote))
+        finally:
+            remote.close()
+    except duckdb.Error as e:
+        current = sync_replica.current_snapshot()
+        if current is None:
+            raise
+        print(f"Replica sync failed ({e}), serving the snapshot of {current['synced_at']}.")
+        return current["path"]
+
+@st.cache_resource(max_entries=sync_replica.REPLICA_KEEP)
+def get_connection(replica_path=None):
+    """
+    One DuckDB connection shared by every session (per replica snapshot);
+    queries run on their own cursors.
+    """
+    if replica_path is not None:
+        return duckdb.connect(replica_path, read_only=True)
+    return sync_replica.connect_warehouse(st.secrets["MOTHERDUCK_TOKEN"], read_only=True)
+
+def cursor():
+    # DuckDB connections are not thread-safe, cursors are (one per Streamlit session thread)
+    return get_connection(replica_snapshot()).cursor()
+
+@st.cache_data(ttl=VERSION_TTL_SECONDS, show_spinner=False)
+def warehouse_version():
+    """Time of the last gold refresh (gold.warehouse_version), None before the first one."""
+    try:
+        return cursor().execute("SELECT MAX(refreshed_at) FROM gold.warehouse_version").fetchone()[0]
+    except duckdb.CatalogException:
+        return None
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, show_spinner=False)
+def cached_query(sql, params, version):
+    return cursor().execute(sql, params).fetchdf()
+
+def run_query(sql, params=None):
+    """Query result memoized per (sql, params) until the warehouse is refreshed."""
+    return cached_query(sql, params, warehouse_version())
+
+def page_offset(label, total_rows, key):
+    """Page selector for a table of total_rows rows; returns the OFFSET of the chosen page."""
+    pages = max(-(-total_rows // PAGE_SIZE), 1)
+    page = st.number_input(f"{label} page (of {pages}, {total_rows:,} rows)",
+                           min_value=1, max_value=pages, value=1, step=1, key=key)
+    return (page - 1) * PAGE_SIZE
+
+def paged_query(sql, order_by, label, key, params=None):
+    """
+    One page of `sql` (a query without ORDER BY), sorted by `order_by` in
+    SQL: only the row count and the rows of the chosen page are fetched.
+    """
+    total_rows = int(run_query(f"SELECT COUNT(*) AS n FROM ({sql})", params)["n"].iloc[0])
+    offset = page_offset(label, total_rows, key)
+    return run_query(f"{sql} ORDER BY {order_by} LIMIT {PAGE_SIZE} OFFSET {offset}", params)
+
+@st.cache_data(ttl=QUERY_TTL_SECONDS, show_spinner=False)
+def cached_heatmap(sql, top_n_actions, version):
+    """Heatmap PNG per filter combination (the SQL), None without openings."""
+    counts = cursor().execute(sql).fetchdf()
+    return create_actions_heatmap(counts, top_n_actions) if not counts.empty else None
 
 # ----------------------------------------
 # 2️⃣ Sidebar filters
 # ----------------------------------------
 st.sidebar.header("Filters")
 
-# Elo slider
-min_elo, max_elo = st.sidebar.slider("Elo range", 800, 3100, (2500, 3100))
+# Filter choices from the one-row gold dimension table
+dimensions = run_query("SELECT civilizations, min_elo, max_elo FROM gold.filter_dimensions").iloc[0]
+elo_floor = int(dimensions["min_elo"] // ELO_BUCKET * ELO_BUCKET)
+elo_ceiling = int(dimensions["max_elo"] // ELO_BUCKET * ELO_BUCKET + ELO_BUCKET)
+
+# Elo slider, in steps of the gold.elo_cube buckets; the default covers every player
+min_elo, max_elo = st.sidebar.slider("Elo range", elo_floor, elo_ceiling,
+                                     (elo_floor, elo_ceiling), step=ELO_BUCKET)
+
+# Half-open Elo range [min_elo, max_elo): the bounds are bucket edges, so
+# filtering player-match facts on elo and gold.elo_cube on elo_bucket selects
+# the same players
+def elo_filter(column="elo"):
+    return f"{column} >= {min_elo} AND {column} < {max_elo}"
 
 # Civilization select
-civilizations = con.execute("SELECT DISTINCT civilization FROM events_clean").fetchdf()
-civilizations_list = civilizations["civilization"].dropna().tolist()
+civilizations_list = list(dimensions["civilizations"])
 selected_civ = st.sidebar.multiselect("Civilization", civilizations_list, default=civilizations_list)
 
+# No civilization selected means no civilization filter
+def civilization_filter():
+    if not selected_civ:
+        return "TRUE"
+    names = ", ".join("'" + c.replace("'", "''") + "'" for c in selected_civ)
+    return f"civilization IN ({names})"
+
 # Opening Build Order length
 top_n_actions = st.sidebar.slider("Opening Build Order Length (top N actions)", 10, 20, 50)
 
@@ -63,80 +173,123 @@ top_n_actions = st.sidebar.slider("Opening Build Order Length (top N actions)",
 # 3️⃣ Load Gold metrics with filters
 # ----------------------------------------
 
+# Player-level tables are paged in section 4: these queries have no ORDER BY,
+# ids are shortened in SQL
+
 # Player summary query
 player_summary_query = f"""
-SELECT *
+SELECT * REPLACE ({short_id_sql('player_id', 8)} AS player_id)
 FROM gold.player_summary
-WHERE max_elo BETWEEN {min_elo} AND {max_elo}
+WHERE {elo_filter('max_elo')}
 """
 
-player_summary_df = con.execute(player_summary_query).fetchdf()
-player_summary_df['player_id'] = player_summary_df['player_id'].apply(lambda x: short_id(x, 8))
-
 # EPM per player-match
 apm_query = f"""
-    SELECT DISTINCT e.elo, a.player_id, a.match_id, a.apm, e.civilization
-    FROM gold.apm a
-    JOIN (
-        SELECT DISTINCT elo, player_id, match_id, civilization
-        FROM events_clean
-    ) e
-    USING(player_id, match_id)
-    WHERE e.elo BETWEEN {min_elo} AND {max_elo}
-      AND e.civilization IN ({','.join([f"'{c}'" for c in selected_civ])})
+    SELECT elo, {short_id_sql('player_id', 8)} AS player_id, {short_id_sql('match_id', 10)} AS match_id,
+        events_first_600s * 60.0 / 600 AS apm, civilization
+    FROM gold.player_match_facts
+    WHERE {elo_filter()}
+      AND {civilization_filter()}
+      AND events_first_600s > 0
 """
-apm_df = con.execute(apm_query).fetchdf()
-apm_df['player_id'] = apm_df['player_id'].apply(lambda x: short_id(x, 8))
-apm_df['match_id'] = apm_df['match_id'].apply(lambda x: short_id(x, 10))
 
 # Age timings
 age_query = f"""
     SELECT civilization, activity, avg_time_mins
     FROM gold.age_timings
-    WHERE civilization IN ({','.join([f"'{c}'" for c in selected_civ])})
+    WHERE {civilization_filter()}
+"""
+age_df = run_query(age_query)
+
+# Opening build orders: one row per player-match, activity codes decoded in SQL
+opening_filter = f"""
+    WHERE {elo_filter()}
+      AND {civilization_filter()}
 """
-age_df = con.execute(age_query).fetchdf()
-
-# Opening build orders
-opening_query = f"""
-    SELECT elo, player_id, match_id, win, activity, action_rank,
-    civilization, civilization_category, map_type, strategy
-    FROM gold.openings
-    WHERE action_rank <= {top_n_actions}
-      AND elo BETWEEN {min_elo} AND {max_elo}
-      AND civilization IN ({','.join([f"'{c}'" for c in selected_civ])})
-    ORDER BY player_id, match_id, action_rank
+def opening_query(actions):
+    return f"""
+    SELECT elo, {short_id_sql('player_id', 8)} AS player_id, {short_id_sql('match_id', 10)} AS match_id,
+    win = 1 AS win, civilization, civilization_category, map_type, strategy,
+    ARRAY_TO_STRING(LIST_TRANSFORM(build_order[1:{actions}], c -> d.names[c]), ' → ') AS activity
+    FROM gold.opening_sequences,
+        (SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d
+    {opening_filter}
 """
-opening_df = con.execute(opening_query).fetchdf()
-opening_df['player_id'] = opening_df['player_id'].apply(lambda x: short_id(x, 8))
-opening_df['match_id'] = opening_df['match_id'].apply(lambda x: short_id(x, 10))
+# Page order; ties broken by the full ids, so pages are stable
+opening_order = "elo DESC, gold.opening_sequences.match_id, gold.opening_sequences.player_id"
 
-# Winrate by civilization
+# Step-action counts for the heatmap, aggregated in SQL for the most frequent activities
+opening_steps_query = f"""
+    WITH steps AS (
+        SELECT code, action_rank, COUNT(*) AS events
+        FROM (
+            SELECT UNNEST(build_order[1:{top_n_actions}]) AS code,
+                UNNEST(RANGE(1, LEN(build_order[1:{top_n_actions}]) + 1)) AS action_rank
+            FROM gold.opening_sequences
+            {opening_filter}
+        )
+        GROUP BY code, action_rank
+    ),
+    top_codes AS (
+        SELECT code
+        FROM steps
+        GROUP BY code
+        ORDER BY SUM(events) DESC, code
+        LIMIT {HEATMAP_TOP_ACTIVITIES}
+    )
+    SELECT d.names[steps.code] AS activity, steps.action_rank, steps.events
+    FROM steps,
+        (SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d
+    WHERE steps.code IN (SELECT code FROM top_codes)
+"""
+
+# Winrate by civilization, rolled up from the Elo-bucket cube
+# (playrate is the share of all games in the Elo range)
+elo_bucket_filter = elo_filter("elo_bucket")
 winrate_query = f"""
-    SELECT civilization, total_games, winrate, playrate
-    FROM gold.winrate_civ
-    WHERE civilization IN ({','.join([f"'{c}'" for c in selected_civ])})
+    SELECT civilization, total_games, winrate, playrate, avg_apm
+    FROM (
+        SELECT
+            civilization,
+            SUM(games) AS total_games,
+            SUM(wins) * 1.0 / SUM(games) AS winrate,
+            SUM(games) * 1.0 / SUM(SUM(games)) OVER () AS playrate,
+            SUM(events_first_600s) * 60.0 / 600 / NULLIF(SUM(apm_games), 0) AS avg_apm
+        FROM gold.elo_cube
+        WHERE {elo_bucket_filter}
+          AND civilization IS NOT NULL
+        GROUP BY civilization
+    )
+    WHERE {civilization_filter()}
+    ORDER BY winrate DESC
 """
-winrate_df = con.execute(winrate_query).fetchdf()
+winrate_df = run_query(winrate_query)
 
-# Winrate by strategy
-civ_conditions = " OR ".join([f"civilizations LIKE '%{c}%'" for c in selected_civ])
+# Winrate by strategy, rolled up from the cube for the selected civilizations
 winrate_civ_query = f"""
-    SELECT strategy, total_games, winrate, civilizations
-    FROM gold.winrate_strat
-    WHERE {civ_conditions}
+    SELECT
+        strategy,
+        SUM(games) AS total_games,
+        SUM(wins) * 1.0 / SUM(games) AS winrate,
+        STRING_AGG(DISTINCT civilization, ', ' ORDER BY civilization) AS civilizations
+    FROM gold.elo_cube
+    WHERE {elo_bucket_filter}
+      AND {civilization_filter()}
+      AND strategy IS NOT NULL
+    GROUP BY strategy
+    ORDER BY winrate DESC
 """
-winrate_civ_df = con.execute(winrate_civ_query).fetchdf()
+winrate_civ_df = run_query(winrate_civ_query)
 
 # Unknown strategies summary
 unknown_strategies_query = """
-            SELECT num_matches, num_players,
+            SELECT cluster_id, num_matches, num_players,
                 ROUND(winrate, 2) AS winrate,
                 avg_ngram, avg_jaccard, avg_levenshtein
             FROM gold.clustered_unknown_strategies
             ORDER BY winrate DESC, num_matches DESC
         """
-unknown_strategies_df = con.execute(unknown_strategies_query).fetchdf()
+unknown_strategies_df = run_query(unknown_strategies_query)
 
 # ----------------------------------------
 # 4️⃣ Display metrics in Streamlit
@@ -144,10 +297,12 @@ unknown_strategies_df = con.execute(unknown_strategies_query).fetchdf()
 st.title("🛡️ Age of Empires Analytics Dashboard")
 
 st.header("👾 All Players Summary")
-st.dataframe(player_summary_df)
+st.dataframe(paged_query(player_summary_query, "max_elo DESC, gold.player_summary.player_id",
+                         "Players", "player_summary_page"))
 
 st.header("📊 EPM (Events per Minute) - First 10 minutes")
-st.dataframe(apm_df)
+st.dataframe(paged_query(apm_query, "elo DESC, gold.player_match_facts.match_id, gold.player_match_facts.player_id",
+                         "EPM", "apm_page"))
 
 st.header("🏰 Average Age Timings")
 #st.dataframe(age_df)
@@ -160,28 +315,21 @@ st.dataframe(pivot_df)
 
 st.header(f"⚔️ Opening Build Orders (Top {top_n_actions} actions)")
 
-# Group actions for each player/match into a single row
-opening_grouped = (
-    opening_df
-    .groupby(["elo", "player_id", "match_id", "win",
-    "civilization", "civilization_category", "map_type", "strategy"
-    ])
-    .agg({
-        "activity": lambda acts: " → ".join(acts),  # Use arrows or commas to separate actions
-        "action_rank": lambda ranks: ", ".join(str(r) for r in ranks)
-    })
-    .reset_index()
-)
-opening_grouped["win"] = opening_grouped["win"].apply(lambda x: True if x == 1 else False)
-opening_grouped = opening_grouped.sort_values("elo", ascending=False)
-opening_grouped = opening_grouped.drop(columns=["action_rank"])
-st.dataframe(opening_grouped)
+opening_page_df = paged_query(opening_query(top_n_actions), opening_order, "Openings", "opening_page")
+st.dataframe(opening_page_df)
 with st.expander("Show table (better actions visibility, but no filters)"):
-    st.write("This static table shows all build order actions for each player-match. You can see the full build order, but sorting and filtering are disabled.")
-    st.table(opening_grouped)
+    st.write("This static table shows all build order actions for each player-match of the current page. You can see the full build order, but sorting and filtering are disabled.")
+    # Full build orders are only fetched on demand
+    if st.checkbox("Load full build orders", key="load_full_openings"):
+        offset = (st.session_state["opening_page"] - 1) * PAGE_SIZE
+        st.table(run_query(f"{opening_query(100)} ORDER BY {opening_order} LIMIT {PAGE_SIZE} OFFSET {offset}"))
 
 st.header("🔥 Build Order Step-Action Heatmap")
-create_actions_heatmap(opening_df)
+heatmap_png = cached_heatmap(opening_steps_query, top_n_actions, warehouse_version())
+if heatmap_png is None:
+    st.write("No openings for the selected filters.")
+else:
+    st.image(heatmap_png)
 
 st.header("🏆 Winrate by Civilization")
 st.dataframe(winrate_df)
@@ -191,3 +339,24 @@ st.dataframe(winrate_civ_df)
 
 st.header("🧩 Unknown Strategies Analysis")
 st.dataframe(unknown_strategies_df)
+
+# Drill into one cluster: representative build and member player-matches
+if not unknown_strategies_df.empty:
+    selected_cluster = st.selectbox("Cluster", unknown_strategies_df["cluster_id"].tolist())
+    representative_df = run_query("""
+        SELECT ARRAY_TO_STRING(LIST_TRANSFORM(r.build_order, c -> d.names[c]), ' → ') AS build_order
+        FROM gold.cluster_representatives r,
+            (SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d
+        WHERE r.cluster_id = ?
+    """, [int(selected_cluster)])
+    if not representative_df.empty:
+        st.write(f"Representative build: {representative_df['build_order'].iloc[0]}")
+    cluster_members_query = f"""
+        SELECT {short_id_sql('m.player_id', 8)} AS player_id, {short_id_sql('m.match_id', 10)} AS match_id,
+            s.elo, s.win, s.civilization, s.map_type
+        FROM gold.cluster_members m
+        JOIN gold.opening_sequences s USING (match_id, player_id)
+        WHERE m.cluster_id = ?
+    """
+    st.dataframe(paged_query(cluster_members_query, "s.elo DESC, m.match_id, m.player_id",
+                             "Members", "cluster_members_page", [int(selected_cluster)]))
@@ -0,0 +1,63 @@
+"""
+Benchmark: materialized bronze table vs zero-copy bronze view.
+
+Extracts a scaled-up tests/test_data.xes into a temporary warehouse, then
+builds events_clean both ways and reports the transform runtime and the
+resulting DuckDB file size.
+
+Run:
+    python benchmarks/bench_bronze.py --repeat 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "pipelines"))
+
+import extract_xes
+import transform_events
+from bench_parser import TEST_XES, scale_xes
+
+def build_copy(con):
+    """Previous layout: bronze copied into DuckDB, events_clean built from the copy."""
+    con.execute(f"CREATE TABLE bronze AS SELECT * FROM '{transform_events.RAW_EVENTS}'")
+    con.execute("CREATE TABLE events_clean AS " + transform_events.SILVER_SELECT.format(source="bronze"))
+
+def build_view(con):
+    """Current layout: bronze is a view over the Parquet parts."""
+    transform_events.create_bronze_view(con)
+    con.execute("CREATE TABLE events_clean AS " + transform_events.SILVER_SELECT.format(source="bronze"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200, help="times to repeat the test traces")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Path("data").mkdir()
+        Path("warehouse").mkdir()
+        scale_xes(TEST_XES, Path("data") / "scaled.xes", args.repeat, unique_ids=True)
+        extract_xes.main([])
+
+        for name, build in [("copy", build_copy), ("view", build_view)]:
+            db_path = Path(f"bench_{name}.duckdb")
+            con = duckdb.connect(str(db_path))
+            start = time.perf_counter()
+            build(con)
+            con.execute("CHECKPOINT")
+            elapsed = time.perf_counter() - start
+            rows = con.execute("SELECT COUNT(*) FROM events_clean").fetchone()[0]
+            con.close()
+            print(f"{name:>5}: {rows:,} events_clean rows in {elapsed:.2f}s, "
+                  f"DuckDB file {db_path.stat().st_size / 1_000_000:.1f} MB")
+        os.chdir(ROOT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: events_clean layouts for the gold build and dashboard queries.
+
+The dashboard queries are the current app/Dashboard.py ones (gold.elo_cube
+rollups and paged gold tables), plus ad-hoc match/player drill-downs into
+events_clean.
+
+  indexed: insertion order + ART indexes on player_id and match_id (previous)
+  sorted:  ordered by (match_id, player_id, seconds_since_start), no indexes
+
+Run:
+    python benchmarks/bench_layout.py --repeat 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "pipelines"))
+
+import extract_xes
+import read_metrics
+import transform_events
+from bench_parser import TEST_XES, scale_xes
+
+# Queries of app/Dashboard.py for one filter setting: Elo range [1200, 2400),
+# every civilization, first page of the paged tables, 20-action openings
+DASHBOARD_ELO = "elo >= 1200 AND elo < 2400"
+DASHBOARD_PAGE = "LIMIT 200 OFFSET 0"
+ACTIVITY_NAMES = "(SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d"
+DASHBOARD_QUERIES = {
+    "filter dimensions": "SELECT civilizations, min_elo, max_elo FROM gold.filter_dimensions",
+    "player summary page": f"""
+        SELECT * FROM gold.player_summary
+        WHERE max_elo >= 1200 AND max_elo < 2400
+        ORDER BY max_elo DESC, player_id {DASHBOARD_PAGE}
+    """,
+    "epm page": f"""
+        SELECT elo, player_id, match_id, events_first_600s * 60.0 / 600 AS apm, civilization
+        FROM gold.player_match_facts
+        WHERE {DASHBOARD_ELO} AND events_first_600s > 0
+        ORDER BY elo DESC, match_id, player_id {DASHBOARD_PAGE}
+    """,
+    "openings page": f"""
+        SELECT elo, player_id, match_id, civilization, strategy,
+            ARRAY_TO_STRING(LIST_TRANSFORM(build_order[1:20], c -> d.names[c]), ' → ') AS activity
+        FROM gold.opening_sequences, {ACTIVITY_NAMES}
+        WHERE {DASHBOARD_ELO}
+        ORDER BY elo DESC, match_id, player_id {DASHBOARD_PAGE}
+    """,
+    "heatmap steps": f"""
+        SELECT d.names[code] AS activity, action_rank, COUNT(*) AS events
+        FROM (
+            SELECT UNNEST(build_order[1:20]) AS code, UNNEST(RANGE(1, LEN(build_order[1:20]) + 1)) AS action_rank
+            FROM gold.opening_sequences
+            WHERE {DASHBOARD_ELO}
+        ), {ACTIVITY_NAMES}
+        GROUP BY ALL
+    """,
+    "winrate cube": """
+        SELECT civilization, SUM(games) AS total_games, SUM(wins) * 1.0 / SUM(games) AS winrate,
+            SUM(events_first_600s) * 60.0 / 600 / NULLIF(SUM(apm_games), 0) AS avg_apm
+        FROM gold.elo_cube
+        WHERE elo_bucket >= 1200 AND elo_bucket < 2400 AND civilization IS NOT NULL
+        GROUP BY civilization
+    """,
+    # Ad-hoc drill-downs into silver, the queries the events_clean layout is for
+    "one match": "SELECT COUNT(*), MAX(seconds_since_start) FROM events_clean WHERE match_id = $match_id",
+    "one player": "SELECT COUNT(*), MAX(seconds_since_start) FROM events_clean WHERE player_id = $player_id",
+}
+
+def build_indexed(con):
+    con.execute("CREATE TABLE events_clean AS " + transform_events.SILVER_SELECT.format(source="bronze"))
+    transform_events.set_indexes(con, True)
+
+def build_sorted(con):
+    con.execute("CREATE TABLE events_clean AS SELECT * FROM ("
+                + transform_events.SILVER_SELECT.format(source="bronze") + ") "
+                + transform_events.SILVER_ORDER)
+
+def timed(fn, rounds=1):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200, help="times to repeat the test traces")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per query (best is kept)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Path("data").mkdir()
+        Path("warehouse").mkdir()
+        os.symlink(ROOT / "sql", "sql")
+        scale_xes(TEST_XES, Path("data") / "scaled.xes", args.repeat, unique_ids=True)
+        extract_xes.main([])
+
+        for name, build in [("indexed", build_indexed), ("sorted", build_sorted)]:
+            con = duckdb.connect(f"bench_{name}.duckdb")
+            transform_events.create_bronze_view(con)
+            print(f"\n=== {name} ===")
+            print(f"{'build events_clean':>20}: {timed(lambda: build(con)):.3f}s")
+            print(f"{'gold build':>20}: {timed(lambda: read_metrics.refresh_gold(con)):.3f}s")
+            match_id, player_id = con.execute(
+                "SELECT match_id, player_id FROM events_clean USING SAMPLE 1 ROWS (reservoir, 42)").fetchone()
+            params = {"match_id": match_id, "player_id": player_id}
+            for label, query in DASHBOARD_QUERIES.items():
+                used = {k: v for k, v in params.items() if f"${k}" in query}
+                elapsed = timed(lambda: con.execute(query, used).fetchall(), args.rounds)
+                print(f"{label:>20}: {elapsed * 1000:.1f}ms")
+            con.close()
+        os.chdir(ROOT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: per-sequence datasketch MinHash/LSH vs batch NumPy stages.
+
+Generates synthetic build orders (mutated copies of a few base openings) and
+times discover_strategies.make_minhash in a loop against
+discover_strategies.minhash_signatures (checking both give the same values),
+then MinHashLSH insert/query grouping against lsh_candidate_groups.
+
+Run:
+    python benchmarks/bench_minhash.py --sequences 20000
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "pipelines"))
+
+import discover_strategies
+from datasketch import LeanMinHash, MinHashLSH
+
+ACTIONS = [f"Build building-{i}" for i in range(40)] + [f"Queue unit-{i}" for i in range(40)]
+
+def synthetic_openings(count, length=100, bases=20, mutation=0.1, seed=42):
+    """Comma-separated openings: random base orders with a share of actions replaced."""
+    rnd = random.Random(seed)
+    base_orders = [[rnd.choice(ACTIONS) for _ in range(length)] for _ in range(bases)]
+    openings = []
+    for _ in range(count):
+        order = [a if rnd.random() > mutation else rnd.choice(ACTIONS) for a in rnd.choice(base_orders)]
+        openings.append(",".join(order[:rnd.randint(length // 2, length)]))
+    return openings
+
+def query_groups(signatures, lsh_threshold):
+    """Previous candidate grouping: one MinHashLSH query per sequence, greedy visited set."""
+    lsh = MinHashLSH(threshold=lsh_threshold, num_perm=signatures.shape[1])
+    minhashes = {}
+    for idx, hashvalues in enumerate(signatures):
+        minhashes[idx] = LeanMinHash(seed=discover_strategies.MINHASH_SEED, hashvalues=hashvalues)
+        lsh.insert(idx, minhashes[idx])
+    groups, visited = [], set()
+    for idx, mh in minhashes.items():
+        if idx in visited:
+            continue
+        bucket = lsh.query(mh)
+        if len(bucket) > 1:
+            groups.append(bucket)
+            visited.update(bucket)
+    return groups
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sequences", type=int, default=20_000, help="number of synthetic openings")
+    parser.add_argument("--ngram", type=int, default=3, help="shingle length")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    parser.add_argument("--lsh-threshold", type=float, default=0.5, help="LSH Jaccard threshold")
+    args = parser.parse_args(argv)
+
+    openings = synthetic_openings(args.sequences)
+
+    start = time.perf_counter()
+    expected = np.array([discover_strategies.make_minhash(s, args.ngram, args.num_perm).hashvalues
+                         for s in openings])
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    signatures = discover_strategies.minhash_signatures(openings, args.ngram, args.num_perm)
+    batch_s = time.perf_counter() - start
+
+    assert (signatures == expected).all(), "batch signatures differ from make_minhash"
+    print(f"{'make_minhash loop':>20}: {loop_s:.2f}s ({args.sequences / loop_s:,.0f} sequences/s)")
+    print(f"{'batch signatures':>20}: {batch_s:.2f}s ({args.sequences / batch_s:,.0f} sequences/s)")
+    print(f"{'speedup':>20}: {loop_s / batch_s:.1f}x")
+
+    start = time.perf_counter()
+    query_groups(signatures, args.lsh_threshold)
+    query_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    groups = discover_strategies.lsh_candidate_groups(signatures, args.lsh_threshold)
+    band_s = time.perf_counter() - start
+
+    print(f"{'LSH query loop':>20}: {query_s:.2f}s")
+    print(f"{'band components':>20}: {band_s:.2f}s ({len(groups)} candidate groups)")
+    print(f"{'speedup':>20}: {query_s / band_s:.1f}x")
+    print(discover_strategies.lsh_bucket_stats(signatures, args.lsh_threshold)
+          .drop(columns="band").describe().loc[["mean", "max"]])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: the full pipeline (extract, transform, gold, discover) on a synthetic log.
+
+Generates a seeded synthetic XES log (benchmarks/synthetic_xes.py), runs every
+stage in a fresh process inside a temporary workspace and records wall time
+and peak RSS per stage. Each run is appended to a JSON history and compared
+with a baseline run of the same scale (the latest one by default); stages
+slower or bigger than the baseline by more than --tolerance are flagged.
+
+Run:
+    python benchmarks/bench_pipeline.py --matches 2000 --events 300
+    python benchmarks/bench_pipeline.py --matches 2000 --events 300 --fail-on-regression
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import platform
+import multiprocessing
+import contextlib
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "pipelines"))
+
+from synthetic_xes import write_synthetic_xes
+
+HISTORY_PATH = ROOT / "benchmarks" / "history.json"
+STAGES = ["extract", "transform", "gold", "discover"]
+
+def run_extract(options):
+    import extract_xes
+    extract_xes.main(["--workers", str(options["workers"])])
+
+def run_transform(options):
+    import transform_events
+    transform_events.main([])
+
+def run_gold(options):
+    import read_metrics
+    read_metrics.main([])
+
+def run_discover(options):
+    import duckdb
+    import discover_strategies
+    con = duckdb.connect(discover_strategies.DB_PATH)
+    df_unknown = discover_strategies.fetch_unknown_strategies(con)
+    clustered, members = discover_strategies.cluster_unknown_sequences(
+        df_unknown, dbscan_min_samples=options["dbscan_min_samples"],
+        workers=options["workers"], with_members=True)
+    discover_strategies.save_discovery_state(con, df_unknown, clustered, members, ngram_n=3, dbscan_eps=0.3)
+    discover_strategies.publish_clusters(con)
+    con.close()
+
+STAGE_RUNNERS = {
+    "extract": run_extract,
+    "transform": run_transform,
+    "gold": run_gold,
+    "discover": run_discover,
+}
+
+def measure_stage(stage, workspace, options):
+    """Run one stage in this (fresh) process; returns seconds and peak RSS in MB."""
+    os.chdir(workspace)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        STAGE_RUNNERS[stage](options)
+        seconds = time.perf_counter() - start
+    # ru_maxrss is in KB on Linux
+    return {"seconds": round(seconds, 4), "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return []
+
+def save_history(path, history):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+def find_baseline(history, scale, run_id=None):
+    """The run with the given id, else the latest run of the same scale."""
+    if run_id is not None:
+        return next((r for r in history if r["run_id"] == run_id), None)
+    same_scale = [r for r in history if r["scale"] == scale]
+    return same_scale[-1] if same_scale else None
+
+def compare(run, baseline, tolerance):
+    """Print the stage metrics against the baseline; returns the flagged regressions."""
+    regressions = []
+    print(f"\n{'stage':>10} {'seconds':>9} {'base':>9} {'peak MB':>9} {'base':>9}")
+    for stage, metrics in run["stages"].items():
+        base = (baseline or {}).get("stages", {}).get(stage)
+        flags = []
+        for metric in ("seconds", "peak_rss_mb"):
+            if base and metrics[metric] > base[metric] * (1 + tolerance):
+                flags.append(f"{metric} +{metrics[metric] / base[metric] - 1:.0%}")
+        regressions += [f"{stage}: {f}" for f in flags]
+        print(f"{stage:>10} {metrics['seconds']:>9.2f} {base['seconds'] if base else float('nan'):>9.2f} "
+              f"{metrics['peak_rss_mb']:>9.1f} {base['peak_rss_mb'] if base else float('nan'):>9.1f}"
+              + ("  REGRESSION " + ", ".join(flags) if flags else ""))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--matches", type=int, default=500, help="matches in the synthetic log (2 players each)")
+    parser.add_argument("--events", type=int, default=200, help="mean events per player-match")
+    parser.add_argument("--seed", type=int, default=42, help="generator seed")
+    parser.add_argument("--workers", type=int, default=1, help="workers for extract and discover")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to run (in order)")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH, help="JSON history file")
+    parser.add_argument("--baseline", default=None, help="run_id to compare with (default: latest of the same scale)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/growth before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args(argv)
+
+    scale = {"matches": args.matches, "events": args.events, "seed": args.seed, "workers": args.workers}
+    options = {"workers": args.workers, "dbscan_min_samples": max(args.matches // 100, 5)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp)
+        (workspace / "data").mkdir()
+        (workspace / "warehouse").mkdir()
+        os.symlink(ROOT / "sql", workspace / "sql")
+        num_events = write_synthetic_xes(workspace / "data" / "synthetic.xes",
+                                         args.matches, args.events, seed=args.seed)
+        print(f"Synthetic log: {num_events:,} events, {args.matches:,} matches")
+
+        stages = {}
+        for stage in args.stages:
+            # Fresh (spawned) process per stage: peak RSS is the stage's own
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                stages[stage] = pool.submit(measure_stage, stage, str(workspace), options).result()
+            print(f"{stage:>10}: {stages[stage]['seconds']:.2f}s, peak {stages[stage]['peak_rss_mb']:.0f} MB")
+
+    history = load_history(args.history)
+    run = {
+        "run_id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "scale": scale,
+        "events": num_events,
+        "stages": stages,
+    }
+    baseline = find_baseline(history, scale, args.baseline)
+    if baseline is None:
+        print("\nNo baseline run of this scale yet.")
+    else:
+        print(f"\nBaseline: {baseline['run_id']} ({baseline.get('git_commit')})")
+    regressions = compare(run, baseline, args.tolerance)
+
+    history.append(run)
+    save_history(args.history, history)
+    print(f"\nAppended run {run['run_id']} to {args.history}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
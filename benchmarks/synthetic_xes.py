@@ -0,0 +1,149 @@
+"""
+Seeded synthetic XES logs in the layout of tests/test_data.xes.
+
+One trace per player-match (2 players per match). Every opening starts with
+the motif of its strategy (slightly mutated) over its first 100 actions, known
+strategies and planted "Unknown" motifs alike, so strategy discovery has real
+clusters to find; the rest of the trace draws activities from a skewed
+distribution, with age-ups at increasing times.
+
+Run:
+    python benchmarks/synthetic_xes.py data/synthetic.xes --matches 1000 --events 300
+"""
+import random
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import quoteattr
+
+# Activity distribution of the filler events (weights)
+ACTIVITIES = {
+    "Queue Villager": 30, "Build house": 8, "Build farm": 6, "Build lumber-camp": 3,
+    "Build mining-camp": 3, "Build mill": 2, "Build barracks": 2, "Build archery-range": 2,
+    "Build stable": 2, "Build blacksmith": 1, "Build market": 1, "Build castle": 1,
+    "Queue Militia": 3, "Queue Archer": 4, "Queue Skirmisher": 3, "Queue Scout Cavalry": 3,
+    "Queue Knight": 2, "Queue Spearman": 2, "Research Loom": 1, "Research Double-Bit Axe": 1,
+    "Research Horse Collar": 1, "Research Fletching": 1, "Build palisade-wall": 2,
+}
+AGE_UPS = ["Research Feudal Age", "Research Castle Age", "Research Imperial Age"]
+
+# Opening motifs; "Unknown" openings get one of the hidden motifs
+STRATEGY_MOTIFS = {
+    "drush": ["Build house", "Build barracks", "Queue Militia", "Queue Militia", "Queue Militia"],
+    "scout_rush": ["Build house", "Build lumber-camp", "Build stable", "Queue Scout Cavalry", "Queue Scout Cavalry"],
+    "archer_rush": ["Build house", "Build barracks", "Build archery-range", "Build archery-range", "Queue Archer"],
+    "fast_castle": ["Build house", "Build mill", "Build farm", "Build blacksmith", "Build market"],
+}
+HIDDEN_MOTIFS = [
+    ["Build palisade-wall", "Build palisade-wall", "Build stable", "Queue Knight", "Queue Knight"],
+    ["Build house", "Build archery-range", "Queue Skirmisher", "Queue Skirmisher", "Queue Spearman"],
+    ["Build mining-camp", "Build mining-camp", "Build castle", "Build palisade-wall", "Queue Archer"],
+]
+MAPS = ["Arabia", "Arena", "Black Forest", "Nomad"]
+CIVILIZATIONS = {
+    "Tatars": "Archery", "Britons": "Archery", "Franks": "Cavalry", "Magyars": "Cavalry",
+    "Aztecs": "Infantry", "Goths": "Infantry", "Byzantines": "Defensive", "Teutons": "Defensive",
+}
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+def digest(*parts):
+    return hashlib.sha256("/".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+def attribute(kind, key, value, indent):
+    return f'{indent}<{kind} key="{key}" value={quoteattr(str(value))}/>\n'
+
+def opening(rnd, motif, length=100, mutation=0.03):
+    """
+    Villager-heavy start followed by the strategy motif over the first `length`
+    actions (the part gold.openings keeps), with a share of actions replaced.
+    """
+    start = ["Queue Villager"] * rnd.randint(2, 4)
+    actions = start + [motif[i % len(motif)] for i in range(length - len(start))]
+    names = list(ACTIVITIES)
+    return [a if rnd.random() > mutation else rnd.choice(names) for a in actions]
+
+def write_synthetic_xes(path, matches=100, events=200, players=None, unknown_share=0.4, seed=42):
+    """
+    Write a synthetic XES log with `matches` matches of 2 players and about
+    `events` events per player-match. Player ids are drawn from a pool of
+    `players` (default: matches / 2), so players repeat their strategies.
+    Returns the number of events written.
+    """
+    rnd = random.Random(seed)
+    players = players or max(matches // 2, 2)
+    names, weights = list(ACTIVITIES), list(ACTIVITIES.values())
+    strategies = list(STRATEGY_MOTIFS)
+    civilizations = list(CIVILIZATIONS)
+    # Every player has a favourite strategy (known or hidden)
+    favourite = {
+        p: ("Unknown", rnd.randrange(len(HIDDEN_MOTIFS))) if rnd.random() < unknown_share
+        else (rnd.choice(strategies), None)
+        for p in range(players)
+    }
+
+    event_index = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        f.write('<log xmlns="http://www.xes-standard.org/" xes.version="2016" xes.features=" ">\n')
+        f.write('\t<extension name="Concept" prefix="concept" uri="http://www.xes-standard.org/concept.xesext"/>\n')
+        f.write('\t<extension name="Time" prefix="time" uri="http://www.xes-standard.org/time.xesext"/>\n')
+        f.write('\t<string key="origin" value="csv"/>\n')
+        for match in range(matches):
+            match_id = digest(seed, "match", match)
+            match_start = START + timedelta(minutes=45 * match)
+            map_type = rnd.choice(MAPS)
+            winner = rnd.randrange(2)
+            for slot, player in enumerate(rnd.sample(range(players), 2)):
+                strategy, hidden = favourite[player]
+                motif = HIDDEN_MOTIFS[hidden] if strategy == "Unknown" else STRATEGY_MOTIFS[strategy]
+                civilization = rnd.choice(civilizations)
+                case_index = match * 2 + slot
+
+                f.write("    <trace>\n")
+                f.write(attribute("string", "concept:name", digest(seed, "case", match, slot), "\t\t"))
+                f.write(attribute("string", "strategy", strategy, "\t\t"))
+                f.write(attribute("string", "match_id", match_id, "\t\t"))
+                f.write(attribute("float", "elo", float(rnd.randint(800, 3000)), "\t\t"))
+                f.write(attribute("string", "player_id", digest(seed, "player", player), "\t\t"))
+                f.write(attribute("string", "map_type", map_type, "\t\t"))
+                f.write(attribute("string", "civilization", civilization, "\t\t"))
+                f.write(attribute("string", "civilization_category", CIVILIZATIONS[civilization], "\t\t"))
+
+                count = max(int(rnd.gauss(events, events / 5)), 10)
+                actions = opening(rnd, motif, min(100, count))
+                actions += rnd.choices(names, weights, k=max(count - len(actions), 0))
+                # Age-ups spread over the game
+                for age, position in enumerate(sorted(rnd.sample(range(len(actions)), min(3, len(actions))))):
+                    actions.insert(position + age, AGE_UPS[age])
+
+                ts = match_start
+                for activity in actions:
+                    ts += timedelta(seconds=rnd.expovariate(1 / 4.0))
+                    f.write("\t\t<event>\n")
+                    f.write(attribute("string", "concept:name", activity, "\t\t\t"))
+                    f.write(attribute("date", "time:timestamp", ts.isoformat(timespec="microseconds"), "\t\t\t"))
+                    f.write(attribute("int", "win", int(slot == winner), "\t\t\t"))
+                    f.write(attribute("int", "amount", 1, "\t\t\t"))
+                    f.write(attribute("int", "@@index", event_index, "\t\t\t"))
+                    f.write(attribute("int", "@@case_index", case_index, "\t\t\t"))
+                    f.write("\t\t</event>\n")
+                    event_index += 1
+                f.write("    </trace>\n")
+        f.write("</log>\n")
+    return event_index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", type=Path, help="output .xes file")
+    parser.add_argument("--matches", type=int, default=100, help="matches (2 player traces each)")
+    parser.add_argument("--events", type=int, default=200, help="mean events per player-match")
+    parser.add_argument("--players", type=int, default=None, help="size of the player pool")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args(argv)
+
+    num_events = write_synthetic_xes(args.path, args.matches, args.events, args.players, seed=args.seed)
+    print(f"Wrote {num_events:,} events of {args.matches:,} matches to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,444 @@
-import duckdb
 import pandas as pd
 import numpy as np
+import hashlib
 from collections import Counter
-from rapidfuzz import fuzz
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from sklearn.cluster import DBSCAN
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.neighbors import sort_graph_by_row_values
 from datasketch import MinHash, MinHashLSH
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
 import mmh3
+import pyarrow as pa
+import argparse
 import streamlit as st
 
+import scoring
+from parallel import map_largest_first
+from sync_replica import connect_warehouse
+
 # --- PARAMETERS ---
 DB_PATH = "warehouse/aoe.duckdb"
 MIN_MATCHES = 10  # Minimum matches to consider a cluster valid
 
+HASH_SEED = 42     # mmh3 seed of the shingle hash
+MINHASH_SEED = 1   # datasketch permutation seed
+MINHASH_BATCH_ROWS = 1 << 15  # shingle positions hashed per block
+
+# Signature cache (DuckDB tables)
+SIGNATURE_CACHE = "cache.minhash_signatures"
+SIGNATURE_CACHE_PARAMS = "cache.minhash_params"
+SIGNATURE_CACHE_TTL_DAYS = 30  # parameter combinations unused for longer are evicted
+
+# Incremental discovery state (DuckDB tables)
+DISCOVERY_RUNS = "cache.strategy_discovery"          # parameters and sizes of the last full clustering
+DISCOVERY_CLUSTERS = "cache.strategy_clusters"       # representative and running similarity sums
+DISCOVERY_NGRAMS = "cache.strategy_cluster_ngrams"   # sum of L2-normalized n-gram rows per cluster
+DISCOVERY_MEMBERS = "cache.strategy_members"         # every tracked opening, cluster_id NULL = unassigned
+RECLUSTER_POOL_GROWTH = 0.2  # new unassigned openings, as a share of the openings at the last full run
+RECLUSTER_DRIFT = 0.5        # openings routed into clusters, as a share of the clustered ones at the last full run
+
+# datasketch MinHash constants (universal hashing modulo a Mersenne prime)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def hash_token(token):
+    """Deterministic 64-bit shingle hash (signed mmh3 seed 42, as uint64)"""
+    return mmh3.hash(token, HASH_SEED, signed=True) & 0xFFFFFFFFFFFFFFFF
+
 def make_minhash(seq, ngram_n=3, num_perm=128):
     """Create deterministic MinHash for a sequence of actions"""
-    def hashfunc(x):
-        h = mmh3.hash(x, 42, signed=True)
-        return h & 0xFFFFFFFFFFFFFFFF  # convert to uint64
-
-    m = MinHash(num_perm=num_perm, hashfunc=hashfunc)
+    m = MinHash(num_perm=num_perm, seed=MINHASH_SEED, hashfunc=hash_token)
 
     # Tokenize sequence
-    if isinstance(seq, list):
-        tokens = ["_".join(seq[i:i+ngram_n]) for i in range(len(seq) - ngram_n + 1)]
-    else:  # string
-        tokens = [seq.split(',')[i:i+ngram_n] for i in range(len(seq.split(',')) - ngram_n + 1)]
-        tokens = ["_".join(t) for t in tokens]
+    actions = seq if isinstance(seq, list) else seq.split(',')
+    tokens = ["_".join(actions[i:i+ngram_n]) for i in range(len(actions) - ngram_n + 1)]
 
     for token in tokens:
         m.update(token.encode("utf-8"))
     return m
 
+def sequence_blocks(offsets, max_rows=None):
+    """
+    Consecutive ranges [lo, hi) of whole sequences with at most max_rows
+    (default MINHASH_BATCH_ROWS) n-gram positions each, offsets as returned by
+    shingle_sequences; a longer sequence gets a block of its own.
+    """
+    max_rows = max_rows or MINHASH_BATCH_ROWS
+    lo, num_seqs = 0, len(offsets) - 1
+    while lo < num_seqs:
+        hi = int(np.searchsorted(offsets, offsets[lo] + max_rows, side="right")) - 1
+        hi = min(max(hi, lo + 1), num_seqs)
+        yield lo, hi
+        lo = hi
+
+def shingle_sequences(sequences, ngram_n=3, names=None):
+    """
+    Tokenize all sequences into n-gram shingles.
+    sequences: comma-separated strings, lists of actions, or lists of activity
+    codes (then names[code - 1] is the action, see gold.activity_dict).
+    Returns (tokens, token_ids, offsets): the distinct shingles (sorted by
+    action ids), the shingle index of every n-gram position and where each
+    sequence's positions start in token_ids (offsets has len(sequences) + 1
+    entries). Windows are built in blocks of MINHASH_BATCH_ROWS positions, so
+    temporaries stay bounded whatever the number of sequences.
+    """
+    seqs = [s.split(',') if isinstance(s, str) else s for s in sequences]
+    lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+
+    # Map actions to integer ids
+    if names is not None:
+        vocab = np.asarray(names, dtype=object)
+        index = None
+    else:
+        index = {}
+        for s in seqs:
+            for a in s:
+                index.setdefault(a, len(index))
+        vocab = np.asarray(list(index), dtype=object)
+
+    # n-gram windows that stay inside their sequence
+    counts = np.maximum(lengths - ngram_n + 1, 0)
+    offsets = np.zeros(len(seqs) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if offsets[-1] == 0:
+        return [], np.zeros(0, dtype=np.int64), offsets
+
+    # One integer key per window when it fits (mixed radix), the raw row bytes otherwise
+    radix = max(len(vocab), 1)
+    packed = radix ** ngram_n < 1 << 63
+    weights = radix ** np.arange(ngram_n - 1, -1, -1, dtype=np.int64)
+    row_type = np.dtype((np.void, 8 * ngram_n))
+
+    token_ids = np.empty(offsets[-1], dtype=np.int64)
+    # Distinct windows seen so far, numbered in order of first appearance:
+    # packed keys sorted with their ids, unpacked rows in a dict
+    known_keys = np.zeros(0, dtype=np.int64)
+    known_ids = np.zeros(0, dtype=np.int64)
+    row_ids = {}
+    for lo, hi in sequence_blocks(offsets):
+        block = seqs[lo:hi]
+        flat = [a for s in block for a in s]
+        if index is None:
+            action_ids = np.asarray(flat, dtype=np.int64) - 1
+        else:
+            action_ids = np.fromiter((index[a] for a in flat), dtype=np.int64, count=len(flat))
+        block_counts = counts[lo:hi]
+        block_offsets = offsets[lo:hi + 1] - offsets[lo]
+        seq_starts = np.concatenate(([0], np.cumsum(lengths[lo:hi])[:-1]))
+        positions = np.repeat(seq_starts - block_offsets[:-1], block_counts) + np.arange(block_offsets[-1])
+        windows = action_ids[positions[:, None] + np.arange(ngram_n)]
+
+        if packed:
+            unique_keys, inverse = np.unique(windows @ weights, return_inverse=True)
+            found = np.searchsorted(known_keys, unique_keys)
+            is_known = found < len(known_keys)
+            is_known[is_known] = known_keys[found[is_known]] == unique_keys[is_known]
+            ids = np.empty(len(unique_keys), dtype=np.int64)
+            ids[is_known] = known_ids[found[is_known]]
+            ids[~is_known] = len(known_keys) + np.arange(np.count_nonzero(~is_known))
+            known_keys = np.concatenate((known_keys, unique_keys[~is_known]))
+            known_ids = np.concatenate((known_ids, ids[~is_known]))
+            order = np.argsort(known_keys, kind="stable")
+            known_keys, known_ids = known_keys[order], known_ids[order]
+        else:
+            unique_rows, inverse = np.unique(np.ascontiguousarray(windows).view(row_type).ravel(),
+                                             return_inverse=True)
+            ids = np.fromiter((row_ids.setdefault(r.tobytes(), len(row_ids)) for r in unique_rows),
+                              dtype=np.int64, count=len(unique_rows))
+        token_ids[offsets[lo]:offsets[hi]] = ids[inverse.reshape(-1)]
+
+    # Renumber the shingles in sorted window order
+    if packed:
+        rank = np.empty(len(known_ids), dtype=np.int64)
+        rank[known_ids] = np.arange(len(known_ids))
+        unique_windows = known_keys[:, None] // weights % radix
+    else:
+        rows = np.frombuffer(b"".join(row_ids), dtype=np.int64).reshape(-1, ngram_n)
+        order = np.lexsort(rows.T[::-1])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        unique_windows = rows[order]
+    tokens = ["_".join(vocab[w]) for w in unique_windows]
+    return tokens, rank[token_ids], offsets
+
+def ngram_matrix(sequences, ngram_n=3, names=None, shingles=None):
+    """
+    Sparse count matrix of activity n-grams: one row per sequence, one column
+    per distinct n-gram of the whole batch (columns follow the shingle index
+    of shingle_sequences, pass shingles to reuse them). Row slices of it give
+    the features of any subset in one consistent space.
+    """
+    tokens, token_ids, offsets = shingles or shingle_sequences(sequences, ngram_n, names)
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    X = csr_matrix((np.ones(len(token_ids), dtype=np.int64), (rows, token_ids)),
+                   shape=(len(offsets) - 1, len(tokens)))
+    X.sum_duplicates()
+    return X
+
+def minhash_signatures(sequences, ngram_n=3, num_perm=128, names=None, shingles=None):
+    """
+    MinHash signatures of all sequences as a (n_sequences, num_perm) uint64
+    matrix. Row i equals make_minhash(sequences[i]).hashvalues: every distinct
+    shingle is hashed once, then each sequence takes the row-wise minimum of
+    its permuted shingle hashes. Wrap a row with
+    LeanMinHash(seed=MINHASH_SEED, hashvalues=row) for datasketch.
+    """
+    tokens, token_ids, offsets = shingles or shingle_sequences(sequences, ngram_n, names)
+    a, b = MinHash(num_perm=num_perm, seed=MINHASH_SEED).permutations
+
+    # Permuted hashes of the distinct shingles (uint64 wrap-around as datasketch)
+    hv = np.fromiter((hash_token(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    permuted = np.empty((len(tokens), num_perm), dtype=np.uint64)
+    for start in range(0, len(tokens), MINHASH_BATCH_ROWS):
+        block = hv[start:start + MINHASH_BATCH_ROWS, None]
+        permuted[start:start + MINHASH_BATCH_ROWS] = (block * a + b) % MERSENNE_PRIME & MAX_HASH
+
+    # Sequences without shingles keep the initial value (empty MinHash)
+    signatures = np.full((len(offsets) - 1, num_perm), MAX_HASH, dtype=np.uint64)
+    counts = np.diff(offsets)
+    for lo, hi in sequence_blocks(offsets):
+        idx = lo + np.flatnonzero(counts[lo:hi])
+        if len(idx) == 0:
+            continue
+        first, last = offsets[lo], offsets[hi]
+        rows = permuted[token_ids[first:last]]
+        signatures[idx] = np.minimum.reduceat(rows, offsets[idx] - first, axis=0)
+    return signatures
+
+def cached_minhash_signatures(con, df, ngram_n=3, num_perm=128, ttl_days=SIGNATURE_CACHE_TTL_DAYS):
+    """
+    minhash_signatures of df['build_order_seq'], reusing the rows stored in
+    cache.minhash_signatures. The cache is keyed by (match_id, player_id,
+    ngram_n, num_perm, seed) and keeps the md5 of the sequence:
+    - changed openings are rehashed, player-matches no longer in df are dropped
+    - parameter combinations unused for ttl_days are evicted
+    Returns the (len(df), num_perm) uint64 matrix in df order.
+    """
+    params = [ngram_n, num_perm, MINHASH_SEED]
+    con.execute("CREATE SCHEMA IF NOT EXISTS cache")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SIGNATURE_CACHE} (
+            match_id VARCHAR,
+            player_id VARCHAR,
+            ngram_n INTEGER,
+            num_perm INTEGER,
+            seed INTEGER,
+            sequence_hash VARCHAR,
+            signature UBIGINT[]
+        )
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SIGNATURE_CACHE_PARAMS} (
+            ngram_n INTEGER,
+            num_perm INTEGER,
+            seed INTEGER,
+            last_used TIMESTAMP
+        )
+    """)
+
+    # Evict stale parameter combinations, then mark this one as used
+    con.execute(f"""
+        DELETE FROM {SIGNATURE_CACHE} c
+        USING {SIGNATURE_CACHE_PARAMS} p
+        WHERE c.ngram_n = p.ngram_n AND c.num_perm = p.num_perm AND c.seed = p.seed
+          AND p.last_used < CAST(now() AS TIMESTAMP) - to_days(CAST(? AS INTEGER))
+    """, [ttl_days])
+    con.execute(f"""
+        DELETE FROM {SIGNATURE_CACHE_PARAMS}
+        WHERE last_used < CAST(now() AS TIMESTAMP) - to_days(CAST(? AS INTEGER))
+           OR (ngram_n = ? AND num_perm = ? AND seed = ?)
+    """, [ttl_days] + params)
+    con.execute(f"INSERT INTO {SIGNATURE_CACHE_PARAMS} VALUES (?, ?, ?, CAST(now() AS TIMESTAMP))", params)
+
+    # Sequence hashes of the requested player-matches
+    con.register("signature_keys", df[['match_id', 'player_id', 'build_order_seq']])
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE sequence_keys AS
+        SELECT ROW_NUMBER() OVER () - 1 AS row_number, match_id, player_id,
+            md5(build_order_seq) AS sequence_hash
+        FROM signature_keys
+    """)
+    con.unregister("signature_keys")
+
+    # Drop cached rows whose opening changed or left the set
+    con.execute(f"""
+        DELETE FROM {SIGNATURE_CACHE} c
+        WHERE c.ngram_n = ? AND c.num_perm = ? AND c.seed = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM sequence_keys k
+              WHERE k.match_id = c.match_id AND k.player_id = c.player_id
+                AND k.sequence_hash = c.sequence_hash
+          )
+    """, params)
+
+    signatures = np.empty((len(df), num_perm), dtype=np.uint64)
+    cached = con.execute(f"""
+        SELECT k.row_number, c.signature
+        FROM sequence_keys k
+        JOIN {SIGNATURE_CACHE} c USING (match_id, player_id, sequence_hash)
+        WHERE c.ngram_n = ? AND c.num_perm = ? AND c.seed = ?
+    """, params).arrow()
+    rows = cached["row_number"].to_numpy()
+    if len(rows):
+        values = cached["signature"].combine_chunks().flatten().to_numpy()
+        signatures[rows] = values.reshape(len(rows), num_perm)
+
+    # Hash only the sequences without a cached signature
+    missing = np.setdiff1d(np.arange(len(df)), rows)
+    if len(missing):
+        sequences = df['build_order_seq'].tolist()
+        fresh = minhash_signatures([sequences[i] for i in missing], ngram_n, num_perm)
+        signatures[missing] = fresh
+        hashes = con.execute("SELECT sequence_hash FROM sequence_keys ORDER BY row_number").fetchnumpy()["sequence_hash"]
+        offsets = np.arange(len(missing) + 1, dtype=np.int32) * num_perm
+        new_rows = pa.table({
+            "match_id": pa.array(df['match_id'].to_numpy()[missing], pa.string()),
+            "player_id": pa.array(df['player_id'].to_numpy()[missing], pa.string()),
+            "ngram_n": pa.array(np.full(len(missing), ngram_n), pa.int32()),
+            "num_perm": pa.array(np.full(len(missing), num_perm), pa.int32()),
+            "seed": pa.array(np.full(len(missing), MINHASH_SEED), pa.int32()),
+            "sequence_hash": pa.array(np.asarray(hashes)[missing], pa.string()),
+            "signature": pa.ListArray.from_arrays(pa.array(offsets), pa.array(fresh.reshape(-1), pa.uint64())),
+        })
+        con.register("new_signatures", new_rows)
+        con.execute(f"INSERT INTO {SIGNATURE_CACHE} BY NAME SELECT * FROM new_signatures")
+        con.unregister("new_signatures")
+    con.execute("DROP TABLE sequence_keys")
+    return signatures
+
+def lsh_bands(num_perm, lsh_threshold):
+    """(bands, rows per band) datasketch's MinHashLSH picks for the threshold"""
+    lsh = MinHashLSH(threshold=lsh_threshold, num_perm=num_perm)
+    return lsh.b, lsh.r
+
+def band_buckets(signatures, lsh_threshold):
+    """
+    Bucket the sequences of every LSH band: yields (bucket id per sequence,
+    bucket sizes, first sequence of each bucket) per band. Sequences share a
+    bucket when their signature values of the band are identical.
+    """
+    bands, rows = lsh_bands(signatures.shape[1], lsh_threshold)
+    band_value = np.dtype((np.void, rows * signatures.dtype.itemsize))
+    for band in range(bands):
+        # Each band row as one opaque value, so unique sorts a 1-D array
+        values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows]).view(band_value).reshape(-1)
+        _, first_member, bucket_ids, sizes = np.unique(
+            values, return_index=True, return_inverse=True, return_counts=True)
+        yield bucket_ids.reshape(-1), sizes, first_member
+
+def lsh_bucket_stats(signatures, lsh_threshold):
+    """
+    Bucket-size statistics per band, to tune lsh_threshold on one signature
+    matrix: buckets, colliding buckets (2+ sequences), largest bucket and
+    candidate pairs.
+    """
+    stats = []
+    for band, (_, sizes, _) in enumerate(band_buckets(signatures, lsh_threshold)):
+        stats.append({
+            "band": band,
+            "buckets": len(sizes),
+            "colliding_buckets": int((sizes > 1).sum()),
+            "max_bucket": int(sizes.max()) if len(sizes) else 0,
+            "candidate_pairs": int((sizes * (sizes - 1) // 2).sum()),
+        })
+    return pd.DataFrame(stats)
+
+def lsh_candidate_groups(signatures, lsh_threshold):
+    """
+    Candidate groups of similar sequences: connected components of the graph
+    linking sequences that share a bucket in any band. Deterministic: groups
+    (2+ sequences) are returned as sorted index arrays, ordered by their
+    first sequence.
+    """
+    n = signatures.shape[0]
+    sources, targets = [], []
+    for bucket_ids, sizes, first_member in band_buckets(signatures, lsh_threshold):
+        # Link every member of a colliding bucket to the bucket's first member
+        colliding = np.flatnonzero(sizes[bucket_ids] > 1)
+        sources.append(colliding)
+        targets.append(first_member[bucket_ids[colliding]])
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+
+    graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1) if n else []
+    groups = [g for g in groups if len(g) > 1]
+    return sorted(groups, key=lambda g: g[0])
+
+def mean_pairwise_cosine(X):
+    """
+    Mean cosine similarity over all pairs of rows of X (upper triangle of
+    cosine_similarity(X)) without the k x k matrix: with L2-normalized rows
+    x_i, sum_{i != j} x_i . x_j = ||sum x_i||^2 - sum ||x_i||^2.
+    """
+    k = X.shape[0]
+    if k < 2:
+        return 1.0
+    Xn = normalize(X.astype(np.float64), norm='l2')
+    total = np.asarray(Xn.sum(axis=0)).ravel()
+    pair_sum = total @ total - Xn.multiply(Xn).sum()
+    return pair_sum / (k * (k - 1))
+
+def sparse_medoid(X):
+    """
+    Row of X closest (euclidean) to the mean row, using sparse dot products:
+    ||x - c||^2 = ||x||^2 - 2 x . c + ||c||^2, and ||c||^2 is the same for all rows.
+    """
+    X = X.astype(np.float64)
+    centroid = np.asarray(X.mean(axis=0)).ravel()
+    sq_norms = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return int(np.argmin(sq_norms - 2 * (X @ centroid)))
 
+def cosine_radius_graph(X, eps):
+    """
+    Sparse precomputed-distance graph for DBSCAN(metric='precomputed'): cosine
+    distances <= eps, plus every row to itself. Only pairs sharing an n-gram
+    are multiplied (distance 1 otherwise, never within eps < 1).
+    """
+    Xn = normalize(X.astype(np.float64), norm='l2')
+    sim = (Xn @ Xn.T).tocoo()
+    dist = np.clip(1.0 - sim.data, 0.0, 2.0)
+    keep = (dist <= eps) & (sim.row != sim.col)
+    n = X.shape[0]
+    rows = np.concatenate([sim.row[keep], np.arange(n)])
+    cols = np.concatenate([sim.col[keep], np.arange(n)])
+    data = np.concatenate([dist[keep], np.zeros(n)])
+    # Explicit zeros stay stored: identical sequences remain neighbors
+    graph = csr_matrix((data, (rows, cols)), shape=(n, n))
+    return sort_graph_by_row_values(graph, warn_when_not_sorted=False)
+
+def fit_dbscan(task):
+    """DBSCAN labels of one candidate group (process pool worker)."""
+    X = task["X"]
+    if task["graph"]:
+        clustering = DBSCAN(metric='precomputed', eps=task["eps"], min_samples=task["min_samples"])
+        return clustering.fit_predict(cosine_radius_graph(X, task["eps"]))
+    clustering = DBSCAN(metric='cosine', eps=task["eps"], min_samples=task["min_samples"])
+    return clustering.fit_predict(X)
+
+def run_dbscan(tasks, workers=1):
+    """Fit DBSCAN on every group serially or in a process pool; labels follow task order."""
+    return map_largest_first(fit_dbscan, tasks, lambda t: t["X"].shape[0], workers)
 
 def fetch_known_strategies(con):
-    """Fetch all known strategies with their build sequences"""
+    """
+    Fetch all known strategies with their build sequences: build_order holds the
+    activity codes of gold.activity_dict, build_order_seq the decoded names
+    """
     query = """
         SELECT
-            strategy,
-            match_id,
-            player_id,
-            STRING_AGG(activity, ',' ORDER BY action_rank) AS build_order_seq
-        FROM gold.openings
-        WHERE strategy IS NOT NULL AND strategy != 'Unknown'
-        GROUP BY strategy, match_id, player_id
-        ORDER BY strategy, match_id, player_id;
+            s.strategy,
+            s.match_id,
+            s.player_id,
+            s.build_order,
+            ARRAY_TO_STRING(LIST_TRANSFORM(s.build_order, c -> d.names[c]), ',') AS build_order_seq
+        FROM gold.opening_sequences s,
+            (SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d
+        WHERE s.strategy IS NOT NULL AND s.strategy != 'Unknown'
+        ORDER BY s.strategy, s.match_id, s.player_id;
     """
     return con.execute(query).fetchdf()
 
@@ -55,15 +446,17 @@ def fetch_unknown_strategies(con):
     """Fetch unknown strategies with ordered build order sequence"""
     query = """
         SELECT
-            match_id,
-            player_id,
-            civilization,
-            map_type,
-            win,
-            STRING_AGG(activity, ',' ORDER BY action_rank) AS build_order_seq
-        FROM gold.openings
-        WHERE strategy = 'Unknown'
-        GROUP BY match_id, player_id, civilization, map_type, win
+            s.match_id,
+            s.player_id,
+            s.civilization,
+            s.map_type,
+            s.win,
+            s.build_order,
+            ARRAY_TO_STRING(LIST_TRANSFORM(s.build_order, c -> d.names[c]), ',') AS build_order_seq
+        FROM gold.opening_sequences s,
+            (SELECT LIST(activity ORDER BY activity_code) AS names FROM gold.activity_dict) d
+        WHERE s.strategy = 'Unknown'
+        ORDER BY s.match_id, s.player_id
     """
     return con.execute(query).fetchdf()
 
@@ -71,106 +464,85 @@ def analyze_known_variation(df_known, ngram_n=3):
     """Check how strict known strategies are"""
     results = []
 
+    # Activity n-gram counts of all known sequences, sliced per strategy
+    df_known = df_known.reset_index(drop=True)
+    sequences = df_known['build_order_seq'].tolist()
+    X_all = ngram_matrix(sequences, ngram_n)
+    groups = df_known.groupby('strategy').indices
+
+    # --- Most common build order of each strategy for Jaccard & Levenshtein ---
+    references = np.arange(len(sequences))
+    for strat, idxs in groups.items():
+        rep_build = Counter(sequences[i] for i in idxs).most_common(1)[0][0]
+        references[idxs] = next(i for i in idxs if sequences[i] == rep_build)
+
+    # Similarity of each sequence to its representative, all strategies at once
+    jaccard, lev = scoring.score_to_reference(sequences, references)
 
-    for strat, group in df_known.groupby('strategy'):
-        # Make sure we have the sequences as strings
-        sequences = group['build_order_seq'].tolist()
-        num_matches = len(sequences)
+    for strat in sorted(groups):
+        idxs = groups[strat]
+        num_matches = len(idxs)
 
         # Skip if no sequences
         if num_matches == 0:
             continue
 
-        # CountVectorizer for n-gram similarity
-        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram_n, ngram_n))
-        X_ngrams = vectorizer.fit_transform(sequences)
-        ngram_sim_matrix = cosine_similarity(X_ngrams)
-
-        # --- Most common build order for Jaccard & Levenshtein ---
-        rep_build = Counter(sequences).most_common(1)[0][0].split(',')
-
-        # Compute Jaccard similarity of each sequence to the representative
-        sim_scores = []
-        for seq in sequences:
-            actions = seq.split(',')
-            set1, set2 = set(actions), set(rep_build)
-            jaccard = len(set1 & set2) / len(set1 | set2)
-            sim_scores.append(jaccard)
-        avg_similarity = sum(sim_scores) / len(sim_scores) if sim_scores else 1.0
-
-        # N-gram similarity: compute upper-triangle mean
-        n = len(sequences)
-        if n > 1:
-            upper_vals = ngram_sim_matrix[np.triu_indices(n, k=1)]
-            avg_ngram_sim = upper_vals.mean()
-        else:
-            avg_ngram_sim = 1.0
-
-        # --- Levenshtein similarity (normalized) ---
-        lev_scores = []
-        for seq in sequences:
-            lev = fuzz.ratio(seq, ','.join(rep_build)) / 100.0  # normalized 0..1
-            lev_scores.append(lev)
-        avg_lev = sum(lev_scores) / len(lev_scores) if lev_scores else 1.0
+        # N-gram similarity: mean over all pairs
+        avg_ngram_sim = mean_pairwise_cosine(X_all[idxs])
 
         results.append({
             "strategy": strat,
             "num_matches": num_matches,
-            "avg_jaccard": avg_similarity * 100,  # %
+            "avg_jaccard": jaccard[idxs].mean() * 100,  # %
             "avg_ngram": avg_ngram_sim * 100,      # %
-            "avg_levenshtein": avg_lev * 100  # %
+            "avg_levenshtein": lev[idxs].mean() * 100  # %
         })
 
     return pd.DataFrame(results)
 
 def cluster_unknown_sequences(df_unknown, ngram_n=3, num_perm=128, lsh_threshold=0.5,
-                            dbscan_eps=0.3, dbscan_min_samples=50, min_matches_per_player=2):
+                            dbscan_eps=0.3, dbscan_min_samples=50, min_matches_per_player=2,
+                            workers=1, dbscan_graph=False, signatures=None, with_members=False):
     """
     Cluster unknown AoE sequences using MinHash + LSH + DBSCAN
     df_unknown: must have columns ['match_id', 'player_id', 'build_order_seq', 'win']
+        (and 'build_order', the activity codes, to save the discovery state)
+    workers: processes fitting DBSCAN on the candidate groups (same result for any value)
+    dbscan_graph: fit DBSCAN on a sparse cosine radius graph instead of all pairwise distances
+    signatures: precomputed minhash_signatures of the sequences (e.g. cached_minhash_signatures)
+    with_members: also return the members of every cluster as a DataFrame
+        ['match_id', 'player_id', 'cluster_id', 'is_representative']
     """
     sequences = df_unknown['build_order_seq'].tolist()
-    match_ids = df_unknown['match_id'].tolist()
-    player_ids = df_unknown['player_id'].tolist()
 
-    # Step 1: LSH bucketing
-    lsh = MinHashLSH(threshold=lsh_threshold, num_perm=num_perm)
-    minhashes = {}
-    for idx, seq in enumerate(sequences):
-        mh = make_minhash(seq, ngram_n, num_perm)
-        key = f"seq{idx}"
-        minhashes[key] = mh
-        lsh.insert(key, mh)
-
-    # Step 2: Collect candidate groups
-    candidate_groups = []
-    visited = set()
-    for key in minhashes.keys():
-        if key in visited:
-            continue
-        bucket = lsh.query(minhashes[key])
-        if len(bucket) > 1:
-            candidate_groups.append(bucket)
-            visited.update(bucket)
+    # Step 1: MinHash signatures of all sequences
+    shingles = shingle_sequences(sequences, ngram_n)
+    if signatures is None:
+        signatures = minhash_signatures(sequences, ngram_n, num_perm, shingles=shingles)
+
+    # Step 2: Candidate groups = connected components of LSH band collisions
+    candidate_groups = lsh_candidate_groups(signatures, lsh_threshold)
 
-    # Step 3: Refine clusters with DBSCAN
+    # Step 3: Refine clusters with DBSCAN on activity n-gram counts
+    X_all = ngram_matrix(sequences, ngram_n, shingles=shingles)
+    tasks = [
+        {"X": X_all[idxs], "eps": dbscan_eps, "min_samples": dbscan_min_samples, "graph": dbscan_graph}
+        for idxs in candidate_groups
+    ]
+    group_labels = run_dbscan(tasks, workers)
+
+    # Cluster ids follow group order and label order, whatever the scheduling
     results = []
+    members = []
     cluster_id = 0
 
-    for group in candidate_groups:
-        idxs = [int(x[3:]) for x in group]
-        group_seqs = [sequences[i] for i in idxs]
+    for idxs, task, labels in zip(candidate_groups, tasks, group_labels):
         group_df = df_unknown.iloc[idxs].copy()
 
-        # Vectorize sequences using n-grams
-        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram_n, ngram_n))
-        X = vectorizer.fit_transform(group_seqs)
-
-        # DBSCAN with cosine metric
-        clustering = DBSCAN(metric='cosine', eps=dbscan_eps, min_samples=dbscan_min_samples)
-        labels = clustering.fit_predict(X)
+        # Activity n-gram rows of the group
+        X = task["X"]
 
-        for label in set(labels):
+        for label in sorted(set(labels)):
             if label == -1:
                 continue  # skip noise
             cluster_mask = (labels == label)
@@ -186,31 +558,19 @@ def cluster_unknown_sequences(df_unknown, ngram_n=3, num_perm=128, lsh_threshold
 
             cluster_seqs = cluster_df['build_order_seq'].tolist()
 
+            X_cluster = X[cluster_mask]
+
             # Representative sequence (medoid = closest to centroid)
-            centroid = np.mean(X[cluster_mask].toarray(), axis=0)
-            dists = np.linalg.norm(X[cluster_mask].toarray() - centroid, axis=1)
-            rep_seq = cluster_df.iloc[np.argmin(dists)]['build_order_seq']
+            rep_idx = sparse_medoid(X_cluster)
 
             # Average n-gram similarity within cluster
-            sim_matrix = cosine_similarity(X[cluster_mask])
-            upper_vals = sim_matrix[np.triu_indices_from(sim_matrix, k=1)] if cluster_size > 1 else np.array([1.0])
-            avg_ngram = upper_vals.mean()
-
-            # --- Jaccard similarity vs. representative ---
-            jaccard_scores = []
-            rep_tokens = set(rep_seq.split(','))
-            for seq in cluster_seqs:
-                seq_tokens = set(seq.split(','))
-                jaccard = len(rep_tokens & seq_tokens) / len(rep_tokens | seq_tokens)
-                jaccard_scores.append(jaccard)
-            avg_jaccard = np.mean(jaccard_scores)
-
-            # --- Levenshtein similarity vs. representative ---
-            lev_scores = []
-            for seq in cluster_seqs:
-                lev = fuzz.ratio(seq, rep_seq) / 100.0
-                lev_scores.append(lev)
-            avg_lev = np.mean(lev_scores)
+            avg_ngram = mean_pairwise_cosine(X_cluster)
+
+            # --- Jaccard & Levenshtein similarity vs. representative ---
+            jaccard_scores, lev_scores = scoring.score_to_reference(
+                cluster_seqs, np.full(cluster_size, rep_idx))
+            avg_jaccard = jaccard_scores.mean()
+            avg_lev = lev_scores.mean()
 
             # Cluster stats
             winrate = cluster_df['win'].mean()
@@ -225,24 +585,324 @@ def cluster_unknown_sequences(df_unknown, ngram_n=3, num_perm=128, lsh_threshold
                 'avg_ngram': avg_ngram,
                 'avg_jaccard': avg_jaccard,
                 'avg_levenshtein': avg_lev,
-                #'representative_build': rep_seq,
-                #'match_ids': match_list
             })
+            members.append(pd.DataFrame({
+                'match_id': match_list,
+                'player_id': cluster_df['player_id'].tolist(),
+                'cluster_id': cluster_id,
+                'is_representative': np.arange(cluster_size) == rep_idx,
+            }))
             cluster_id += 1
 
+    clusters = pd.DataFrame(results)
     if not len(results) == 0:
-        return pd.DataFrame(results).sort_values('winrate', ascending=False)
-    return pd.DataFrame(results)
+        clusters = clusters.sort_values('winrate', ascending=False)
+    if with_members:
+        member_columns = ['match_id', 'player_id', 'cluster_id', 'is_representative']
+        return clusters, pd.concat(members, ignore_index=True) if members else pd.DataFrame(columns=member_columns)
+    return clusters
+
+def cluster_ngram_sums(X, cluster_ids):
+    """
+    (cluster_id, token, weight) rows: per cluster, the sum of the L2-normalized
+    n-gram rows of its members (token = n-gram string, see ngram_matrix).
+    X is (ngram matrix, tokens); cluster_ids gives the cluster of every row.
+    """
+    X, tokens = X
+    Xn = normalize(X.astype(np.float64), norm='l2')
+    clusters, rows = np.unique(cluster_ids, return_inverse=True)
+    indicator = csr_matrix((np.ones(len(rows)), (rows.reshape(-1), np.arange(len(rows)))),
+                           shape=(len(clusters), X.shape[0]))
+    sums = (indicator @ Xn).tocoo()
+    return pa.table({
+        "cluster_id": pa.array(clusters[sums.row], pa.int64()),
+        "token": pa.array(np.asarray(tokens, dtype=object)[sums.col], pa.string()),
+        "weight": pa.array(sums.data, pa.float64()),
+    })
+
+def ngram_features(sequences, ngram_n):
+    """(ngram matrix, n-gram strings of its columns) of the sequences."""
+    shingles = shingle_sequences(sequences, ngram_n)
+    return ngram_matrix(sequences, ngram_n, shingles=shingles), shingles[0]
+
+def create_discovery_tables(con):
+    con.execute("CREATE SCHEMA IF NOT EXISTS cache")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DISCOVERY_RUNS} (
+            ngram_n INTEGER,
+            dbscan_eps DOUBLE,
+            tracked_at_full BIGINT,
+            assigned_at_full BIGINT,
+            clustered_at TIMESTAMP,
+            min_matches_per_player INTEGER
+        )
+    """)
+    con.execute(f"ALTER TABLE {DISCOVERY_RUNS} ADD COLUMN IF NOT EXISTS min_matches_per_player INTEGER")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DISCOVERY_CLUSTERS} (
+            cluster_id BIGINT,
+            rep_match_id VARCHAR,
+            rep_player_id VARCHAR,
+            rep_sequence VARCHAR,
+            rep_build_order SMALLINT[],
+            sum_jaccard DOUBLE,
+            sum_levenshtein DOUBLE,
+            sum_sq_norm DOUBLE
+        )
+    """)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {DISCOVERY_NGRAMS} (cluster_id BIGINT, token VARCHAR, weight DOUBLE)")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DISCOVERY_MEMBERS} (
+            match_id VARCHAR,
+            player_id VARCHAR,
+            win INTEGER,
+            cluster_id BIGINT,
+            sequence_hash VARCHAR
+        )
+    """)
+    # State saved before sequence hashes were tracked: NULL hashes read as changed
+    con.execute(f"ALTER TABLE {DISCOVERY_MEMBERS} ADD COLUMN IF NOT EXISTS sequence_hash VARCHAR")
+
+def sequence_hashes(sequences):
+    """md5 of every build_order_seq, the same key as cache.minhash_signatures."""
+    return [hashlib.md5(seq.encode("utf-8")).hexdigest() for seq in sequences]
+
+def insert_arrow(con, table, rows):
+    """Bulk insert an Arrow table (columns matched by name)."""
+    con.register("arrow_rows", rows)
+    con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM arrow_rows")
+    con.unregister("arrow_rows")
+
+def save_discovery_state(con, df_unknown, clusters, members, ngram_n, dbscan_eps, min_matches_per_player=2):
+    """
+    Replace the incremental discovery state with the result of a full
+    clustering (cluster_unknown_sequences(..., with_members=True)).
+    """
+    create_discovery_tables(con)
+    for table in (DISCOVERY_RUNS, DISCOVERY_CLUSTERS, DISCOVERY_NGRAMS, DISCOVERY_MEMBERS):
+        con.execute(f"DELETE FROM {table}")
+
+    # Every unknown opening is tracked; unclustered ones form the unassigned pool
+    tracked = df_unknown[['match_id', 'player_id', 'win', 'build_order', 'build_order_seq']].merge(
+        members, on=['match_id', 'player_id'], how='left')
+    insert_arrow(con, DISCOVERY_MEMBERS, pa.table({
+        "match_id": pa.array(tracked['match_id'], pa.string()),
+        "player_id": pa.array(tracked['player_id'], pa.string()),
+        "win": pa.array(tracked['win'], pa.int32()),
+        "cluster_id": pa.array(tracked['cluster_id'], pa.int64(), from_pandas=True),
+        "sequence_hash": pa.array(sequence_hashes(tracked['build_order_seq']), pa.string()),
+    }))
+
+    clustered = tracked[tracked['cluster_id'].notna()].reset_index(drop=True)
+    if len(clustered):
+        features = ngram_features(clustered['build_order_seq'].tolist(), ngram_n)
+        cluster_ids = clustered['cluster_id'].to_numpy(dtype=np.int64)
+        insert_arrow(con, DISCOVERY_NGRAMS, cluster_ngram_sums(features, cluster_ids))
+
+        reps = clustered[clustered['is_representative'].astype(bool)].set_index('cluster_id')
+        stats = clusters.set_index('cluster_id').loc[reps.index]
+        non_empty = pd.Series(features[0].getnnz(axis=1) > 0).groupby(cluster_ids).sum()
+        insert_arrow(con, DISCOVERY_CLUSTERS, pa.table({
+            "cluster_id": pa.array(reps.index.to_numpy(dtype=np.int64), pa.int64()),
+            "rep_match_id": pa.array(reps['match_id'], pa.string()),
+            "rep_player_id": pa.array(reps['player_id'], pa.string()),
+            "rep_sequence": pa.array(reps['build_order_seq'], pa.string()),
+            "rep_build_order": pa.array([list(b) for b in reps['build_order']], pa.list_(pa.int16())),
+            "sum_jaccard": pa.array(stats['avg_jaccard'] * stats['num_matches'], pa.float64()),
+            "sum_levenshtein": pa.array(stats['avg_levenshtein'] * stats['num_matches'], pa.float64()),
+            "sum_sq_norm": pa.array(non_empty.loc[reps.index].to_numpy(dtype=np.float64), pa.float64()),
+        }))
+
+    con.execute(f"INSERT INTO {DISCOVERY_RUNS} VALUES (?, ?, ?, ?, CAST(now() AS TIMESTAMP), ?)",
+                [ngram_n, dbscan_eps, len(tracked), len(clustered), min_matches_per_player])
+
+def assign_new_openings(con, df_unknown, ngram_n=3, dbscan_eps=0.3, min_matches_per_player=2):
+    """
+    Route openings not seen by the last clustering to the cluster whose
+    representative is nearest (cosine distance <= dbscan_eps), others to the
+    unassigned pool, and update the clusters' running aggregates. Unassigned
+    openings whose sequence changed (sequence_hash) are routed again.
+    min_matches_per_player only discards clusters at the full clustering;
+    routing only adds members, so the kept clusters still satisfy it.
+    Returns False when a full recluster is needed instead: no state for these
+    parameters, tracked openings that left the unknown set, clustered openings
+    whose sequence changed (their old contributions to the running sums are
+    not known), or the pool growth / cluster drift since the last full run
+    above RECLUSTER_POOL_GROWTH / RECLUSTER_DRIFT.
+    """
+    create_discovery_tables(con)
+    run = con.execute(f"""
+        SELECT ngram_n, dbscan_eps, min_matches_per_player, tracked_at_full, assigned_at_full
+        FROM {DISCOVERY_RUNS}
+    """).fetchone()
+    if run is None or run[:3] != (ngram_n, dbscan_eps, min_matches_per_player):
+        return False
+    _, _, _, tracked_at_full, assigned_at_full = run
+
+    con.register("unknown_keys", df_unknown[['match_id', 'player_id']].assign(
+        sequence_hash=sequence_hashes(df_unknown['build_order_seq'])))
+    left, changed_clustered = con.execute(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE k.match_id IS NULL),
+            COUNT(*) FILTER (WHERE k.match_id IS NOT NULL AND m.cluster_id IS NOT NULL
+                             AND m.sequence_hash IS DISTINCT FROM k.sequence_hash)
+        FROM {DISCOVERY_MEMBERS} m
+        LEFT JOIN unknown_keys k USING (match_id, player_id)
+    """).fetchone()
+    if left or changed_clustered:
+        con.unregister("unknown_keys")
+        return False
+
+    # Changed unassigned openings are routed again like new ones
+    con.execute(f"""
+        DELETE FROM {DISCOVERY_MEMBERS} m
+        USING unknown_keys k
+        WHERE m.match_id = k.match_id AND m.player_id = k.player_id
+          AND m.sequence_hash IS DISTINCT FROM k.sequence_hash
+    """)
+    new_rows = con.execute(f"""
+        SELECT k.rowid_ FROM (SELECT *, ROW_NUMBER() OVER () - 1 AS rowid_ FROM unknown_keys) k
+        ANTI JOIN {DISCOVERY_MEMBERS} m USING (match_id, player_id)
+        ORDER BY k.rowid_
+    """).fetchnumpy()["rowid_"]
+    con.unregister("unknown_keys")
+
+    new = df_unknown.iloc[np.asarray(new_rows, dtype=np.int64)].reset_index(drop=True)
+    reps = con.execute(f"SELECT cluster_id, rep_sequence FROM {DISCOVERY_CLUSTERS} ORDER BY cluster_id").fetchdf()
+    cluster_of = np.full(len(new), -1, dtype=np.int64)
+    if len(new) and len(reps):
+        # Representatives and new openings in one n-gram space
+        sequences = reps['rep_sequence'].tolist() + new['build_order_seq'].tolist()
+        X, tokens = ngram_features(sequences, ngram_n)
+        Xn = normalize(X.astype(np.float64), norm='l2')
+        sim = (Xn[len(reps):] @ Xn[:len(reps)].T).toarray()
+        nearest = sim.argmax(axis=1)
+        routed = 1.0 - sim[np.arange(len(new)), nearest] <= dbscan_eps
+        cluster_of[routed] = reps['cluster_id'].to_numpy()[nearest[routed]]
+
+        if routed.any():
+            new_idx = np.flatnonzero(routed)
+            # Running similarity sums vs. the representative
+            jaccard, lev = scoring.score_to_reference(sequences, np.concatenate(
+                [np.arange(len(reps)), nearest]))
+            jaccard, lev = jaccard[len(reps):][new_idx], lev[len(reps):][new_idx]
+            non_empty = X[len(reps):][new_idx].getnnz(axis=1) > 0
+            partial = pd.DataFrame({"cluster_id": cluster_of[new_idx], "jaccard": jaccard,
+                                    "levenshtein": lev, "sq_norm": non_empty.astype(np.float64)})
+            partial = partial.groupby("cluster_id", as_index=False).sum()
+            con.register("cluster_partials", pa.Table.from_pandas(partial, preserve_index=False))
+            con.execute(f"""
+                UPDATE {DISCOVERY_CLUSTERS} c
+                SET sum_jaccard = c.sum_jaccard + p.jaccard,
+                    sum_levenshtein = c.sum_levenshtein + p.levenshtein,
+                    sum_sq_norm = c.sum_sq_norm + p.sq_norm
+                FROM cluster_partials p
+                WHERE c.cluster_id = p.cluster_id
+            """)
+            con.unregister("cluster_partials")
+
+            # Merge the n-gram sums of the routed openings
+            X_new = X[len(reps):][new_idx]
+            insert_arrow(con, DISCOVERY_NGRAMS, cluster_ngram_sums((X_new, tokens), cluster_of[new_idx]))
+            con.execute(f"""
+                CREATE OR REPLACE TABLE {DISCOVERY_NGRAMS} AS
+                SELECT cluster_id, token, SUM(weight) AS weight
+                FROM {DISCOVERY_NGRAMS}
+                GROUP BY cluster_id, token
+            """)
+
+    if len(new):
+        insert_arrow(con, DISCOVERY_MEMBERS, pa.table({
+            "match_id": pa.array(new['match_id'], pa.string()),
+            "player_id": pa.array(new['player_id'], pa.string()),
+            "win": pa.array(new['win'], pa.int32()),
+            "cluster_id": pa.array(np.where(cluster_of >= 0, cluster_of, None), pa.int64(), from_pandas=True),
+            "sequence_hash": pa.array(sequence_hashes(new['build_order_seq']), pa.string()),
+        }))
+
+    tracked, assigned = con.execute(
+        f"SELECT COUNT(*), COUNT(cluster_id) FROM {DISCOVERY_MEMBERS}").fetchone()
+    pool_growth = ((tracked - assigned) - (tracked_at_full - assigned_at_full)) / max(tracked_at_full, 1)
+    drift = (assigned - assigned_at_full) / max(assigned_at_full, 1)
+    return pool_growth <= RECLUSTER_POOL_GROWTH and drift <= RECLUSTER_DRIFT
+
+def publish_clusters(con):
+    """
+    gold.clustered_unknown_strategies from the discovery state, with the
+    drill-down tables gold.cluster_members (one row per clustered
+    player-match) and gold.cluster_representatives (the medoid build order as
+    activity codes of gold.activity_dict).
+    """
+    con.execute("CREATE SCHEMA IF NOT EXISTS gold")
+    con.execute(f"""
+        CREATE OR REPLACE TABLE gold.cluster_members AS
+        SELECT cluster_id, match_id, player_id
+        FROM {DISCOVERY_MEMBERS}
+        WHERE cluster_id IS NOT NULL
+        ORDER BY cluster_id, match_id, player_id
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE gold.cluster_representatives AS
+        SELECT
+            cluster_id,
+            rep_match_id AS match_id,
+            rep_player_id AS player_id,
+            rep_build_order AS build_order
+        FROM {DISCOVERY_CLUSTERS}
+        ORDER BY cluster_id
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE gold.clustered_unknown_strategies AS
+        WITH member_stats AS (
+            SELECT
+                cluster_id,
+                COUNT(*) AS num_matches,
+                AVG(win) AS winrate,
+                COUNT(DISTINCT player_id) AS num_players
+            FROM {DISCOVERY_MEMBERS}
+            WHERE cluster_id IS NOT NULL
+            GROUP BY cluster_id
+        ),
+        ngram_stats AS (
+            SELECT cluster_id, SUM(weight * weight) AS sum_norm_sq
+            FROM {DISCOVERY_NGRAMS}
+            GROUP BY cluster_id
+        )
+        SELECT
+            c.cluster_id,
+            m.num_matches,
+            m.winrate,
+            m.num_players,
+            -- Mean pairwise cosine: (||sum x_i||^2 - sum ||x_i||^2) / (k (k - 1))
+            CASE WHEN m.num_matches < 2 THEN 1.0
+                 ELSE (COALESCE(n.sum_norm_sq, 0) - c.sum_sq_norm) / (m.num_matches * (m.num_matches - 1))
+            END AS avg_ngram,
+            c.sum_jaccard / m.num_matches AS avg_jaccard,
+            c.sum_levenshtein / m.num_matches AS avg_levenshtein
+        FROM {DISCOVERY_CLUSTERS} c
+        JOIN member_stats m USING (cluster_id)
+        LEFT JOIN ngram_stats n USING (cluster_id)
+        ORDER BY winrate DESC, cluster_id
+    """)
+    # New clusters invalidate the dashboard's query cache
+    con.execute("CREATE OR REPLACE TABLE gold.warehouse_version AS SELECT NOW() AS refreshed_at")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover unknown strategies by clustering openings")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes fitting DBSCAN on the LSH candidate groups")
+    parser.add_argument("--dbscan-graph", action="store_true",
+                        help="fit DBSCAN on a sparse cosine radius graph")
+    parser.add_argument("--incremental", action="store_true",
+                        help="route new openings to the existing clusters instead of reclustering")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every MinHash signature instead of reusing cache.minhash_signatures")
+    args = parser.parse_args(argv)
 
-def main():
     md_token = st.secrets["MOTHERDUCK_TOKEN"]
 
-    con = duckdb.connect(f"md:?motherduck_token={md_token}")
-    if con is None:
-        print("Failed to connect to MotherDuck Database, using local database instead.")
-        con = duckdb.connect(DB_PATH)
-    else:
-        con.execute("USE aoe;")
+    # Discovery writes its results, so it runs against the remote, not a replica
+    con = connect_warehouse(md_token)
     ############################################
     ### Known strategies analysis (for reference)
     ############################################
@@ -256,8 +916,22 @@ def main():
     #################################
 
     df_unknown = fetch_unknown_strategies(con)
-    #clustered = cluster_unknown_strategies(df_unknown, eps=0.1, min_samples=5)
-    clustered = cluster_unknown_sequences(df_unknown, ngram_n=3, min_matches_per_player=3)
+    params = dict(ngram_n=3, dbscan_eps=0.3, min_matches_per_player=3)
+
+    if args.incremental and assign_new_openings(con, df_unknown, **params):
+        print("Assigned new openings to the existing clusters")
+    else:
+        if args.incremental:
+            print("No usable discovery state, or pool growth/drift above threshold: full recluster")
+        signatures = None if args.no_cache else cached_minhash_signatures(con, df_unknown, ngram_n=3)
+        #clustered = cluster_unknown_strategies(df_unknown, eps=0.1, min_samples=5)
+        clustered, members = cluster_unknown_sequences(df_unknown, workers=args.workers,
+                                                       dbscan_graph=args.dbscan_graph, signatures=signatures, with_members=True, **params)
+        save_discovery_state(con, df_unknown, clustered, members, **params)
+
+    ### Replace existing table with the clusters of the discovery state
+    publish_clusters(con)
+    clustered = con.execute("SELECT * FROM gold.clustered_unknown_strategies").fetchdf()
 
     if not clustered.empty:
 
@@ -265,20 +939,6 @@ def main():
         #print(clustered["match_ids"].iloc[0])
         print(clustered.head(10))
 
-        ### Debug output
-        # print(f"Found {df_clusters['cluster_id'].nunique()} valid unknown strategy clusters")
-        # print(df_clusters.head(10))
-
-        ### Replace existing table with fresh clusters
-        con.execute("DROP TABLE IF EXISTS gold.clustered_unknown_strategies")
-
-        con.register("df_clusters_view", clustered)
-        con.execute("""
-            CREATE TABLE gold.clustered_unknown_strategies AS
-            SELECT * FROM df_clusters_view
-        """)
-        con.unregister("df_clusters_view")
-
 
 if __name__ == "__main__":
     main()
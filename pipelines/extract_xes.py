@@ -1,26 +1,85 @@
 import os
+import io
+import mmap
+import time
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from lxml import etree
 from dateutil import parser as dtparse
 from pathlib import Path
 
+from parallel import map_largest_first
+
 DATA_DIR = Path("data")
 OUT_DIR = Path("warehouse")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
-BRONZE_PATH = OUT_DIR / "events_raw.parquet"
+BRONZE_PATH = OUT_DIR / "events_raw.parquet"  # legacy single-file output
+BRONZE_DIR = OUT_DIR / "events_raw"  # one Parquet part per parsed file piece
+MANIFEST_PATH = OUT_DIR / "ingest_manifest.json"  # source file fingerprints -> parts
 
 CHUNK_SIZE = 100_000  # Number of events per chunk
+SPLIT_BYTES = 256 * 1024 * 1024  # Files larger than this are split at trace boundaries
+
+# Fixed bronze schema: column order preferred by downstream processing.
+# Every chunk is written as one Parquet row group with exactly these columns.
+# Column types are fixed per attribute name, chosen to match the XES type tags
+# the AoE logs use (<int> -> int64, <float> -> float64, <date> -> timestamp,
+# <string> -> string); the tag of each value is not checked. Flags such as
+# win are int64: <boolean> values and "true"/"false" strings become 1/0.
+# Values that are not valid for their column's type (e.g. 1.5 for an int64
+# column) are not coerced: the typed column gets NULL and the raw value is
+# kept in unparsed_values (column name -> raw string). Integers that overflow
+# int64 raise instead.
+# Low-cardinality strings are dictionary-encoded.
+XES_STRING = pa.string()
+XES_DICT = pa.dictionary(pa.int32(), pa.string())
+XES_INT = pa.int64()
+XES_FLOAT = pa.float64()
+XES_DATE = pa.timestamp("ns", tz="UTC")
+XES_BOOLEANS = {"true": 1, "false": 0}  # <boolean> values, case-insensitive
+XES_UNPARSED = pa.map_(pa.string(), pa.string())
+XES_INT_PATTERN = r"^[+-]?[0-9]+$"
 
-def parse_xes_file_chunked(xes_path, chunk_callback):
+BRONZE_SCHEMA = pa.schema([
+    ("event_id", XES_STRING),
+    ("ts", XES_DATE),
+    ("activity", XES_DICT),
+    ("match_id", XES_STRING),
+    ("player_id", XES_STRING),
+    ("map_type", XES_DICT),
+    ("civilization", XES_DICT),
+    ("civilization_category", XES_DICT),
+    ("elo", XES_FLOAT),
+    ("case_id", XES_STRING),
+    ("strategy", XES_DICT),
+    ("win", XES_INT),
+    ("amount", XES_INT),
+    ("@@index", XES_INT),
+    ("@@case_index", XES_INT),
+    ("unparsed_values", XES_UNPARSED),
+])
+BRONZE_COLUMNS = BRONZE_SCHEMA.names[:-1]  # filled from XES attributes
+
+def parse_xes_file_chunked(xes_path, chunk_callback, chunk_size=None):
     """
     Efficiently parse a large XES file and process events in chunks.
     Calls chunk_callback(rows) every CHUNK_SIZE events.
+    xes_path may also be a file-like object (see TraceRangeReader).
     """
     ns = "{http://www.xes-standard.org/}" # XES namespace
+    chunk_size = chunk_size or CHUNK_SIZE
 
     rows = []
     trace_attrs = {}
     case_id = None
+    event_pos = 0
 
     # Use lxml's iterparse for low-memory XML parsing
     context = etree.iterparse(xes_path, events=("start", "end"))
@@ -30,6 +89,7 @@ def parse_xes_file_chunked(xes_path, chunk_callback):
         if event == "start" and elem.tag == f"{ns}trace":
             trace_attrs = {}
             case_id = None
+            event_pos = 0
 
         elif event == "end":
             # Case level attributes
@@ -41,6 +101,8 @@ def parse_xes_file_chunked(xes_path, chunk_callback):
                 trace_attrs[elem.attrib["key"]] = elem.attrib.get("value")
             elif elem.tag == f"{ns}int" and elem.getparent().tag == f"{ns}trace":
                 trace_attrs[elem.attrib["key"]] = elem.attrib.get("value")
+            elif elem.tag == f"{ns}boolean" and elem.getparent().tag == f"{ns}trace":
+                trace_attrs[elem.attrib["key"]] = elem.attrib.get("value")
 
             # Event-level attributes
             elif elem.tag == f"{ns}event":
@@ -56,13 +118,17 @@ def parse_xes_file_chunked(xes_path, chunk_callback):
                         ev[child.attrib["key"]] = child.attrib.get("value")
                     elif child.tag == f"{ns}int":
                         ev[child.attrib["key"]] = child.attrib.get("value")
+                    elif child.tag == f"{ns}boolean":
+                        ev[child.attrib["key"]] = child.attrib.get("value")
                     elif child.tag == f"{ns}date":
                         ev["ts"] = child.attrib.get("value") # Timestamp
 
-                # stable event_id: prefer @@index if present
+                # stable event_id: prefer @@index if present, else the
+                # event's position in its trace (independent of chunking)
                 idx = ev.get("@@index")
                 if idx is None:
-                    idx = str(len(rows))
+                    idx = str(event_pos)
+                event_pos += 1
                 ev["event_id"] = f"{case_id}-{idx}"
 
                 # merge case attributes so each row has full context
@@ -70,7 +136,7 @@ def parse_xes_file_chunked(xes_path, chunk_callback):
                 rows.append(ev)
 
                 # if enough events, process chunk and clear memory
-                if len(rows) >= CHUNK_SIZE:
+                if len(rows) >= chunk_size:
                     chunk_callback(rows)
                     rows.clear()
                 elem.clear()  # Free memory
@@ -83,44 +149,449 @@ def parse_xes_file_chunked(xes_path, chunk_callback):
     if rows:
         chunk_callback(rows)
 
-def main():
-    xes_files = list(DATA_DIR.glob("*.xes"))
+# Precomputed XES tags for the fast parser
+XES_NS = "{http://www.xes-standard.org/}"
+TAG_TRACE = f"{XES_NS}trace"
+TAG_EVENT = f"{XES_NS}event"
+TAG_STRING = f"{XES_NS}string"
+TAG_FLOAT = f"{XES_NS}float"
+TAG_INT = f"{XES_NS}int"
+TAG_DATE = f"{XES_NS}date"
+TAG_BOOLEAN = f"{XES_NS}boolean"
+
+# Keys and values of the attributes of all events of a trace, in document order
+XES_XPATH_NS = {"x": XES_NS[1:-1]}
+EVENT_KEYS = etree.XPath("x:event/*/@key", namespaces=XES_XPATH_NS, smart_strings=False)
+EVENT_VALUES = etree.XPath("x:event/*/@value", namespaces=XES_XPATH_NS, smart_strings=False)
+
+def parse_xes_file_fast(xes_path, chunk_callback, chunk_size=None):
+    """
+    Fast-path XES parser with the same output as parse_xes_file_chunked.
+    Only trace end tags are delivered by iterparse; events are accumulated
+    column-wise (dict of BRONZE_COLUMNS lists). When every event of a trace
+    has the same attribute keys in the same order (the usual case), all keys
+    and values are read with two compiled XPath queries and each column is a
+    strided slice of the values (an attribute key is assumed to keep its type
+    tag within a trace); other traces are read event by event. Trace-level
+    attributes are then filled in for the whole trace.
+    Calls chunk_callback(columns) at the first trace end after chunk_size events.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    n = 0  # rows accumulated in the current chunk
+
+    def new_chunk():
+        # Column lists plus per-tag lookups: attribute key -> column list
+        columns = {c: [] for c in BRONZE_COLUMNS}
+        string_cols = dict(columns, **{"concept:name": columns["activity"]})
+        tag_cols = {TAG_STRING: string_cols, TAG_FLOAT: columns, TAG_INT: columns, TAG_BOOLEAN: columns}
+        return columns, tag_cols, columns["ts"]
+
+    def event_column(tag, key):
+        # Column of an event attribute, None if it is not part of bronze
+        if tag == TAG_DATE:
+            return ts_col
+        key_cols = tag_cols.get(tag)
+        return key_cols.get(key) if key_cols is not None else None
+
+    def set_value(col, row, value):
+        # Pad columns missing in earlier rows; a repeated key overwrites
+        m = len(col)
+        if m > row:
+            col[row] = value
+        else:
+            if m < row:
+                col.extend([None] * (row - m))
+            col.append(value)
+
+    columns, tag_cols, ts_col = new_chunk()
+    context = etree.iterparse(xes_path, events=("end",), tag=TAG_TRACE)
+    for _, elem in context:
+        trace_start = n  # first row of the trace
+        events = list(elem.iterchildren(TAG_EVENT))
+        num_events = len(events)
+        if num_events:
+            first = events[0]
+            width = len(first)
+            keys = EVENT_KEYS(elem)
+            values = EVENT_VALUES(elem)
+            uniform = (
+                len(keys) == len(values) == width * num_events
+                and all(len(event) == width for event in events)
+                and keys == keys[:width] * num_events
+            )
+            if uniform:
+                for j, child in enumerate(first):
+                    col = event_column(child.tag, keys[j])
+                    if col is None:
+                        continue
+                    if len(col) < trace_start:
+                        col.extend([None] * (trace_start - len(col)))
+                    del col[trace_start:]  # a repeated key overwrites
+                    col.extend(values[j::width])
+                n += num_events
+            else:
+                for event in events:
+                    for child in event:
+                        col = event_column(child.tag, child.get("key"))
+                        if col is None:
+                            continue
+                        if len(col) == n:
+                            col.append(child.get("value"))
+                        else:
+                            set_value(col, n, child.get("value"))
+                    n += 1
+
+        # Broadcast case attributes over the trace's events
+        case_id = None
+        for child in elem.iterchildren(TAG_STRING, TAG_FLOAT, TAG_INT, TAG_BOOLEAN):
+            key = child.get("key")
+            value = child.get("value")
+            if key == "concept:name" and child.tag == TAG_STRING:
+                case_id = value
+            col = columns.get(key)
+            if col is not None and num_events:
+                if len(col) < n:
+                    col.extend([None] * (n - len(col)))
+                col[trace_start:n] = [value] * num_events
+
+        if num_events:
+            idx_col = columns["@@index"]
+            if len(idx_col) < n:
+                idx_col.extend([None] * (n - len(idx_col)))
+            columns["case_id"][trace_start:n] = [case_id] * num_events
+            columns["event_id"][trace_start:n] = [
+                f"{case_id}-{idx if idx is not None else pos}"
+                for pos, idx in enumerate(idx_col[trace_start:n])
+            ]
+
+        # Free memory: drop the trace and every processed sibling before it
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+        if n >= chunk_size:
+            chunk_callback(columns)
+            columns, tag_cols, ts_col = new_chunk()
+            n = 0
+
+    if n:
+        chunk_callback(columns)
+
+class TraceRangeReader:
+    """
+    File-like view over a byte range of an XES file that starts at a <trace>
+    tag. The log header is prepended and the closing </log> appended, so the
+    piece parses as a standalone XES log.
+    """
+    def __init__(self, xes_path, start, end, header=b"", footer=b""):
+        self._file = open(xes_path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+        self._header = header
+        self._footer = footer
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = io.DEFAULT_BUFFER_SIZE
+        if self._header:
+            data, self._header = self._header, b""
+            return data
+        if self._remaining > 0:
+            data = self._file.read(min(size, self._remaining))
+            self._remaining = self._remaining - len(data) if data else 0
+            if data:
+                return data
+        data, self._footer = self._footer, b""
+        if not data:
+            self._file.close()
+        return data
+
+def split_by_traces(xes_path, split_bytes=None):
+    """
+    Split an XES file into byte ranges of roughly split_bytes, cut at <trace>
+    boundaries. Returns (header_end, [(start, end), ...]); small files yield a
+    single range covering the whole file.
+    """
+    split_bytes = split_bytes or SPLIT_BYTES
+    size = os.path.getsize(xes_path)
+    if size <= split_bytes:
+        return 0, [(0, size)]
+
+    def next_trace(mm, pos):
+        # Next "<trace" start tag at or after pos (not e.g. "<traceX")
+        while True:
+            pos = mm.find(b"<trace", pos)
+            if pos == -1 or mm[pos + 6:pos + 7] in (b">", b" ", b"\t", b"\n", b"\r"):
+                return pos
+            pos += 6
+
+    with open(xes_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = next_trace(mm, 0)
+        if header_end == -1:
+            return 0, [(0, size)]
+        cuts = [0]
+        num_pieces = -(-size // split_bytes)
+        for k in range(1, num_pieces):
+            pos = next_trace(mm, max(k * size // num_pieces, header_end + 1))
+            if pos == -1:
+                break
+            if pos > cuts[-1]:
+                cuts.append(pos)
+    cuts.append(size)
+    return header_end, list(zip(cuts[:-1], cuts[1:]))
+
+def plan_tasks(xes_files, out_dir, split_bytes=None, chunk_size=None, engine="fast"):
+    """
+    Build the deterministic list of extraction tasks: one per file piece,
+    in sorted file order. The plan depends only on the inputs, never on the
+    number of workers, so serial and parallel runs write identical parts.
+    """
+    tasks = []
+    for xes_file in sorted(xes_files):
+        header_end, ranges = split_by_traces(xes_file, split_bytes)
+        for piece, (start, end) in enumerate(ranges):
+            tasks.append({
+                "xes_file": str(xes_file),
+                "piece": piece,
+                "num_pieces": len(ranges),
+                "start": start,
+                "end": end,
+                "header_end": header_end,
+                "part_path": str(Path(out_dir) / f"{Path(xes_file).stem}-{piece:04d}.parquet"),
+                "chunk_size": chunk_size or CHUNK_SIZE,
+                "engine": engine,
+            })
+    return tasks
+
+def to_typed_array(values, type):
+    """
+    Convert raw XES attribute values to an Arrow array of the given bronze type.
+    Returns (array, rejected): rejected is a boolean mask of the values that
+    are not valid for the type (NULL in the array), None if all are.
+    """
+    arr = pa.array(values, type=pa.string())
+    if type == XES_STRING:
+        return arr, None
+    if type == XES_DICT:
+        return arr.dictionary_encode(), None
+    try:
+        return arr.cast(type), None  # safe cast: e.g. "1.5" is rejected for int64
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    if type == XES_INT:
+        arr = pc.utf8_trim_whitespace(arr)
+        lowered = pc.utf8_lower(arr)
+        for text, flag in XES_BOOLEANS.items():
+            arr = pc.if_else(pc.equal(lowered, text), str(flag), arr)
+        valid = pc.fill_null(pc.match_substring_regex(arr, XES_INT_PATTERN), False)
+        typed = pc.if_else(valid, arr, pa.scalar(None, pa.string())).cast(type)
+    else:
+        series = pd.Series(values, dtype=object)
+        if type == XES_DATE:
+            typed = pa.array(pd.to_datetime(series, errors="coerce", utc=True), type=type)
+        else:
+            typed = pa.array(pd.to_numeric(series, errors="coerce"), from_pandas=True).cast(type)
+    rejected = np.asarray(pc.and_(arr.is_valid(), typed.is_null()))
+    return typed, rejected if rejected.any() else None
+
+def unparsed_array(rejected, num_rows):
+    """unparsed_values column: {column: raw value} of the rejected values per row."""
+    if not rejected:
+        return pa.nulls(num_rows, XES_UNPARSED)
+    rows = [None] * num_rows
+    for name, (values, mask) in rejected.items():
+        for i in np.flatnonzero(mask):
+            rows[i] = (rows[i] or []) + [(name, values[i])]
+    return pa.array(rows, type=XES_UNPARSED)
+
+def columns_to_record_batch(columns):
+    """Convert a chunk of column lists into an Arrow record batch with BRONZE_SCHEMA."""
+    num_rows = max(len(v) for v in columns.values())
+    arrays = []
+    rejected = {}
+    for field in BRONZE_SCHEMA:
+        if field.name not in BRONZE_COLUMNS:
+            continue
+        values = columns.get(field.name) or []
+        if len(values) < num_rows:
+            values = values + [None] * (num_rows - len(values))
+        array, mask = to_typed_array(values, field.type)
+        arrays.append(array)
+        if mask is not None:
+            rejected[field.name] = (values, mask)
+    arrays.append(unparsed_array(rejected, num_rows))
+    return pa.RecordBatch.from_arrays(arrays, schema=BRONZE_SCHEMA)
+
+def rows_to_record_batch(rows):
+    """Convert a chunk of event dicts into an Arrow record batch with BRONZE_SCHEMA."""
+    return columns_to_record_batch({c: [r.get(c) for r in rows] for c in BRONZE_COLUMNS})
+
+# Parser engines: name -> (parse function, chunk -> record batch converter)
+PARSERS = {
+    "legacy": (parse_xes_file_chunked, rows_to_record_batch),
+    "fast": (parse_xes_file_fast, columns_to_record_batch),
+}
+
+def report_throughput(xes_file, num_events, elapsed):
+    """Print per-file parsing throughput (events/s and MB/s)."""
+    size_mb = os.path.getsize(xes_file) / 1_000_000
+    elapsed = max(elapsed, 1e-9)
+    print(f"   {num_events:,} events in {elapsed:.2f}s "
+          f"({num_events / elapsed:,.0f} events/s, {size_mb / elapsed:.1f} MB/s)")
+
+def extract_piece(task):
+    """
+    Parse one planned file piece and stream it into its own Parquet part.
+    Runs in a worker process; returns (part_path, num_events, elapsed).
+    """
+    start_time = time.perf_counter()
+    num_events = 0
+    if task["num_pieces"] == 1:
+        source = task["xes_file"]
+    else:
+        with open(task["xes_file"], "rb") as f:
+            header = f.read(task["header_end"])
+        source = TraceRangeReader(
+            task["xes_file"], task["start"], task["end"],
+            header=header if task["start"] > 0 else b"",
+            footer=b"</log>\n" if task["end"] < os.path.getsize(task["xes_file"]) else b"",
+        )
+
+    parse, to_record_batch = PARSERS[task["engine"]]
+    with pq.ParquetWriter(task["part_path"], BRONZE_SCHEMA) as writer:
+        def write_chunk(chunk):
+            nonlocal num_events
+            batch = to_record_batch(chunk)
+            writer.write_batch(batch)
+            num_events += batch.num_rows
+
+        parse(source, write_chunk, chunk_size=task["chunk_size"])
+
+    return task["part_path"], num_events, time.perf_counter() - start_time
+
+def run_tasks(tasks, workers=1):
+    """Run extraction tasks serially or in a process pool; results follow task order."""
+    return map_largest_first(extract_piece, tasks, lambda t: t["end"] - t["start"], workers)
+
+def file_fingerprint(xes_file):
+    """Content hash (sha256) of a source file, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(xes_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def schema_fingerprint():
+    """Short hash of BRONZE_SCHEMA; parts written with another schema are re-extracted."""
+    return hashlib.sha256(str(BRONZE_SCHEMA).encode("utf-8")).hexdigest()[:16]
+
+def load_manifest():
+    """Read the ingestion manifest, or an empty one if missing or from another schema."""
+    if MANIFEST_PATH.exists():
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        if manifest.get("schema") == schema_fingerprint():
+            return manifest
+    return {"schema": schema_fingerprint(), "files": {}, "last_batch": {}}
+
+def save_manifest(manifest):
+    """Atomically replace the ingestion manifest."""
+    tmp = MANIFEST_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, MANIFEST_PATH)
+
+def plan_ingestion(xes_files, manifest):
+    """
+    Compare source files with the manifest.
+    Returns (changed, removed): files to (re)parse with their fresh stat/hash
+    info, and manifest paths whose source file no longer exists.
+    Size and mtime are checked first; the content hash only when they differ.
+    """
+    entries = manifest["files"]
+    changed = []
+    for xes_file in xes_files:
+        st = os.stat(xes_file)
+        info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        entry = entries.get(str(xes_file))
+        parts_ok = entry is not None and all((BRONZE_DIR / p).exists() for p in entry["parts"])
+        if parts_ok and entry["size"] == info["size"] and entry["mtime_ns"] == info["mtime_ns"]:
+            continue
+        info["sha256"] = file_fingerprint(xes_file)
+        if parts_ok and entry["sha256"] == info["sha256"]:
+            entry.update(info)  # touched, content unchanged
+            continue
+        changed.append((xes_file, info))
+
+    current = {str(f) for f in xes_files}
+    removed = sorted(p for p in entries if p not in current)
+    return changed, removed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract XES event logs into bronze Parquet parts")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of parser processes (default: 1, serial)")
+    parser.add_argument("--engine", choices=sorted(PARSERS), default="fast",
+                        help="XES parser engine (default: fast)")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the ingestion manifest and re-extract every file")
+    args = parser.parse_args(argv)
+
+    xes_files = sorted(DATA_DIR.glob("*.xes"))
     if not xes_files:
         raise FileNotFoundError(f"No .xes files found in {DATA_DIR}")
 
-    # Remove old parquet if exists
+    # Legacy single-file output is superseded by the parts dataset
     if BRONZE_PATH.exists():
         BRONZE_PATH.unlink()
+    if args.full and BRONZE_DIR.exists():
+        shutil.rmtree(BRONZE_DIR)
+    BRONZE_DIR.mkdir(parents=True, exist_ok=True)
+
+    manifest = {"schema": schema_fingerprint(), "files": {}, "last_batch": {}} if args.full else load_manifest()
+    if not manifest["files"]:
+        # No usable manifest: any parts on disk are of unknown origin
+        for stale in BRONZE_DIR.glob("*.parquet"):
+            stale.unlink()
+    changed, removed = plan_ingestion(xes_files, manifest)
 
-    all_rows = []
+    # Drop the parts of deleted and changed files before re-parsing
+    removed_parts = []
+    for path in removed + [str(f) for f, _ in changed]:
+        entry = manifest["files"].pop(path, None)
+        if entry is None:
+            continue
+        for part in entry["parts"]:
+            (BRONZE_DIR / part).unlink(missing_ok=True)
+            removed_parts.append(part)
+
+    changed_files = [f for f, _ in changed]
+    tasks = plan_tasks(changed_files, BRONZE_DIR, engine=args.engine)
+    print(f"Processing {len(changed_files)} new/changed of {len(xes_files)} files "
+          f"as {len(tasks)} pieces with {args.workers} worker(s), {len(removed)} removed ...")
+    results = run_tasks(tasks, args.workers)
+
+    # Per-file report, summing the pieces of split files
     total_events = 0
+    added_parts = []
+    for xes_file, info in changed:
+        pieces = [r for t, r in zip(tasks, results) if t["xes_file"] == str(xes_file)]
+        file_events = sum(r[1] for r in pieces)
+        total_events += file_events
+        parts = [Path(r[0]).name for r in pieces]
+        added_parts += parts
+        manifest["files"][str(xes_file)] = dict(info, events=file_events, parts=parts)
+        print(f"Processed {xes_file}")
+        report_throughput(xes_file, file_events, sum(r[2] for r in pieces))
 
-    def write_chunk(chunk_rows):
-        nonlocal all_rows, total_events
-        all_rows.extend(chunk_rows)
-        total_events += len(chunk_rows)
+    manifest["last_batch"] = {
+        "added_parts": added_parts,
+        "removed_parts": sorted(set(removed_parts) - set(added_parts)),
+        "replaced_parts": sorted(set(removed_parts) & set(added_parts)),
+        "full": bool(args.full),
+    }
+    save_manifest(manifest)
 
-    for xes_file in xes_files:
-        print(f"Processing {xes_file} ...")
-        parse_xes_file_chunked(xes_file, write_chunk)
-
-    # Write all events to Parquet in one go
-    if all_rows:
-        df = pd.DataFrame(all_rows)
-        # Preferred column order for downstream processing
-        preferred = [
-            "event_id", "ts", "activity",
-            "match_id", "player_id", "map_type", "civilization", "civilization_category", "elo",
-            "case_id", "strategy", "win", "amount", "@@index", "@@case_index"
-        ]
-        cols = [c for c in preferred if c in df.columns] + [c for c in df.columns if c not in preferred]
-        df = df[cols]
-        if "ts" in df.columns:
-            df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
-        # Write to Parquet file
-        df.to_parquet(BRONZE_PATH, index=False, engine="pyarrow")
-
-    print(f"✅ Parsed {len(xes_files)} files with {total_events:,} events")
+    print(f"✅ Parsed {len(changed_files)} files with {total_events:,} events into {BRONZE_DIR}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,18 @@
+from concurrent.futures import ProcessPoolExecutor
+
+def map_largest_first(fn, tasks, size, workers=1):
+    """
+    fn(task) for every task, serially or in a process pool of `workers`.
+    The pool schedules the biggest tasks (by size(task)) first, so one large
+    task doesn't finish last; results always follow task order.
+    """
+    if workers <= 1:
+        return [fn(t) for t in tasks]
+
+    order = sorted(range(len(tasks)), key=lambda i: size(tasks[i]), reverse=True)
+    results = [None] * len(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {i: pool.submit(fn, tasks[i]) for i in order}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
@@ -1,19 +1,30 @@
 import duckdb
+import argparse
 
 # Paths
 DB_PATH = "warehouse/aoe.duckdb"
 SQL_PATH = "sql/metrics.sql"
+INCREMENTAL_SQL_PATH = "sql/metrics_incremental.sql"
+MERGE_SQL_PATH = "sql/metrics_merge.sql"  # shared by both: facts, upserts and rollups
 
-# Connect to DuckDB
-con = duckdb.connect(DB_PATH)
+def table_exists(con, schema, name):
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+        [schema, name],
+    ).fetchone()[0] > 0
 
-# Read and execute metrics SQL
-with open(SQL_PATH, "r", encoding="utf-8") as f:
-    sql_script = f.read()
-con.execute(sql_script)
+def run_script(con, path):
+    with open(path, "r", encoding="utf-8") as f:
+        sql_script = f.read()
+    con.execute(sql_script)
+
+def refresh_gold(con, incremental=False):
+    """Select the player-matches to (re)compute (all, or the pending batch's), then merge them into gold."""
+    run_script(con, INCREMENTAL_SQL_PATH if incremental else SQL_PATH)
+    run_script(con, MERGE_SQL_PATH)
 
 # Helper function to preview a table
-def preview(table_name, limit=5):
+def preview(con, table_name, limit=5):
     print(f"\n=== {table_name} ===")
     try:
         df = con.execute(f"SELECT * FROM {table_name} LIMIT {limit}").df()
@@ -21,12 +32,37 @@ def preview(table_name, limit=5):
     except Exception as e:
         print(f"Error reading {table_name}: {e}")
 
-# Preview each gold table
-preview("gold.apm")
-preview("gold.player_summary")
-preview("gold.age_timings")
-preview("gold.openings")
-preview("gold.winrate_civ")
-preview("gold.winrate_strat")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the gold metrics tables")
+    parser.add_argument("--incremental", action="store_true",
+                        help="merge the pending silver batch instead of rebuilding every table")
+    args = parser.parse_args(argv)
+
+    # Connect to DuckDB
+    con = duckdb.connect(DB_PATH)
+
+    # Incremental refresh needs a pending batch and gold partial aggregates to merge into
+    incremental = (
+        args.incremental
+        and table_exists(con, "main", "events_batch")
+        and table_exists(con, "gold", "player_match_facts")
+    )
+    if args.incremental and not incremental:
+        print("No pending silver batch or gold partial aggregates, running a full refresh.")
+
+    refresh_gold(con, incremental)
+
+    # Preview each gold table
+    preview(con, "gold.player_match_facts")
+    preview(con, "gold.apm")
+    preview(con, "gold.player_summary")
+    preview(con, "gold.age_timings")
+    preview(con, "gold.openings")
+    preview(con, "gold.opening_sequences")
+    preview(con, "gold.winrate_civ")
+    preview(con, "gold.winrate_strat")
+
+    con.close()
 
-con.close()
+if __name__ == "__main__":
+    main()
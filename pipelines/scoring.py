@@ -0,0 +1,60 @@
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+from scipy.sparse import csr_matrix
+
+# Parallel threads of rapidfuzz (-1 = all cores)
+WORKERS = -1
+
+def encode_sequences(sequences, vocabulary=None):
+    """
+    Integer-encode action sequences (comma-separated strings or lists of
+    actions). Returns (encoded, vocabulary): a list of int lists and the
+    action -> code dict, extended with unseen actions when one is passed.
+    """
+    vocabulary = {} if vocabulary is None else vocabulary
+    encoded = [
+        [vocabulary.setdefault(a, len(vocabulary)) for a in (s.split(',') if isinstance(s, str) else s)]
+        for s in sequences
+    ]
+    return encoded, vocabulary
+
+def presence_matrix(encoded, num_actions):
+    """Sparse binary matrix: row i has a 1 for every action present in encoded[i]."""
+    lengths = [len(s) for s in encoded]
+    rows = np.repeat(np.arange(len(encoded)), lengths)
+    cols = np.fromiter((a for s in encoded for a in s), dtype=np.int64, count=sum(lengths))
+    P = csr_matrix((np.ones(len(cols), dtype=np.int32), (rows, cols)), shape=(len(encoded), num_actions))
+    P.data[:] = 1  # duplicates were summed
+    return P
+
+def jaccard_to_reference(P, references):
+    """
+    Jaccard similarity of the action sets of every row of P to the row
+    references[i] of P, from sparse intersections: |A & B| / (|A| + |B| - |A & B|).
+    """
+    R = P[references]
+    inter = np.asarray(P.multiply(R).sum(axis=1)).ravel()
+    sizes = np.asarray(P.sum(axis=1)).ravel()
+    union = sizes + sizes[references] - inter
+    return np.divide(inter, union, out=np.ones(len(inter)), where=union > 0)
+
+def levenshtein_to_reference(encoded, references):
+    """
+    Normalized Indel similarity (fuzz.ratio / 100) of encoded[i] to
+    encoded[references[i]], counting activity edits, on all rapidfuzz threads.
+    """
+    if len(encoded) == 0:
+        return np.zeros(0)
+    return process.cpdist(encoded, [encoded[r] for r in references],
+                          scorer=Indel.normalized_similarity, workers=WORKERS).astype(np.float64)
+
+def score_to_reference(sequences, references):
+    """
+    Jaccard and Levenshtein similarity of every sequence to its reference
+    sequence (an index into sequences), in one batch. Returns two arrays.
+    """
+    encoded, vocabulary = encode_sequences(sequences)
+    references = np.asarray(references, dtype=np.int64)
+    P = presence_matrix(encoded, len(vocabulary))
+    return jaccard_to_reference(P, references), levenshtein_to_reference(encoded, references)
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import duckdb
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Paths
+DB_PATH = "warehouse/aoe.duckdb"
+REPLICA_DIR = "warehouse/replica"
+CURRENT_FILE = "current.json"  # points at the snapshot being served
+
+# Gold tables read by the dashboard, copied into every snapshot
+REPLICA_TABLES = [
+    "warehouse_version",
+    "filter_dimensions",
+    "player_summary",
+    "player_match_facts",
+    "age_timings",
+    "activity_dict",
+    "opening_sequences",
+    "elo_cube",
+    "clustered_unknown_strategies",
+    "cluster_members",
+    "cluster_representatives",
+]
+REPLICA_KEEP = 2  # snapshots kept on disk (the current one and its predecessor)
+
+def connect_warehouse(md_token=None, read_only=False):
+    """
+    The MotherDuck warehouse (database aoe) when a token is given and it is
+    reachable, else the local warehouse/aoe.duckdb.
+    """
+    if md_token:
+        try:
+            con = duckdb.connect(f"md:?motherduck_token={md_token}")
+            con.execute("USE aoe;")
+            return con
+        except duckdb.Error as e:
+            print(f"Failed to connect to MotherDuck Database ({e}), using local database instead.")
+    return duckdb.connect(DB_PATH, read_only=read_only)
+
+def warehouse_version(con):
+    """Time of the last gold refresh of a warehouse (gold.warehouse_version), None without one."""
+    try:
+        return con.execute("SELECT MAX(refreshed_at) FROM gold.warehouse_version").fetchone()[0]
+    except duckdb.CatalogException:
+        return None
+
+def current_snapshot(replica_dir=REPLICA_DIR):
+    """The served snapshot ({'path', 'version', 'synced_at'}), None before the first sync."""
+    path = Path(replica_dir) / CURRENT_FILE
+    if not path.exists():
+        return None
+    current = json.loads(path.read_text(encoding="utf-8"))
+    return current if Path(current["path"]).exists() else None
+
+def write_snapshot(remote, path):
+    """Copy REPLICA_TABLES from the remote into a new DuckDB file; returns the tables copied."""
+    remote_tables = {
+        name for (name,) in remote.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'gold'"
+        ).fetchall()
+    }
+    copied = []
+    local = duckdb.connect(str(path))
+    try:
+        local.execute("CREATE SCHEMA gold")
+        for table in REPLICA_TABLES:
+            if table not in remote_tables:
+                continue
+            # Streamed as Arrow record batches: memory is bounded by a batch, not the table
+            reader = remote.execute(f"SELECT * FROM gold.{table}").fetch_record_batch()
+            local.register("remote_table", reader)
+            local.execute(f"CREATE TABLE gold.{table} AS SELECT * FROM remote_table")
+            local.unregister("remote_table")
+            copied.append(table)
+    finally:
+        local.close()
+    return copied
+
+def prune_snapshots(replica_dir, keep=REPLICA_KEEP):
+    """Delete all but the `keep` newest snapshots."""
+    snapshots = sorted(Path(replica_dir).glob("aoe-*.duckdb"))
+    for path in snapshots[:-keep]:
+        path.unlink()
+
+def sync_replica(remote, replica_dir=REPLICA_DIR, force=False):
+    """
+    Snapshot the remote's gold tables into a local read-only DuckDB file when
+    the remote's warehouse version differs from the served snapshot's (or
+    when forced). Snapshots are written next to the served one and swapped
+    in atomically, so open readers keep a consistent copy. Returns the path
+    of the snapshot to serve.
+    """
+    replica_dir = Path(replica_dir)
+    replica_dir.mkdir(parents=True, exist_ok=True)
+    version = warehouse_version(remote)
+    current = current_snapshot(replica_dir)
+    if current is not None and not force and current["version"] == str(version):
+        return Path(current["path"])
+
+    synced_at = datetime.now(timezone.utc)
+    path = replica_dir / f"aoe-{synced_at.strftime('%Y%m%dT%H%M%S%fZ')}.duckdb"
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    copied = write_snapshot(remote, tmp)
+    os.replace(tmp, path)
+
+    pointer = replica_dir / CURRENT_FILE
+    pointer_tmp = pointer.with_suffix(".tmp")
+    pointer_tmp.write_text(json.dumps({
+        "path": str(path),
+        "version": str(version),
+        "synced_at": synced_at.isoformat(),
+        "tables": copied,
+    }, indent=2), encoding="utf-8")
+    os.replace(pointer_tmp, pointer)
+
+    prune_snapshots(replica_dir)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the gold tables into a local read-only replica")
+    parser.add_argument("--source", default=None,
+                        help="DuckDB file to sync from (default: MotherDuck, token from the Streamlit secrets)")
+    parser.add_argument("--replica-dir", default=REPLICA_DIR, help="directory of the replica snapshots")
+    parser.add_argument("--force", action="store_true", help="take a new snapshot even if the version is unchanged")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="keep syncing every INTERVAL seconds instead of once")
+    args = parser.parse_args(argv)
+
+    while True:
+        if args.source:
+            remote = duckdb.connect(args.source, read_only=True)
+        else:
+            import streamlit as st
+            remote = connect_warehouse(st.secrets["MOTHERDUCK_TOKEN"], read_only=True)
+        try:
+            previous = current_snapshot(args.replica_dir)
+            path = sync_replica(remote, args.replica_dir, force=args.force)
+        finally:
+            remote.close()
+        if previous is not None and Path(previous["path"]) == path:
+            print(f"Replica up to date: {path} (version {previous['version']})")
+        else:
+            print(f"New replica snapshot: {path}")
+
+        if args.interval is None:
+            break
+        args.force = False  # later rounds only sync on a version change
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,191 @@
 import duckdb
 import os
+import json
+import argparse
 
 WAREHOUSE = "warehouse/aoe.duckdb"
-RAW_EVENTS = "warehouse/events_raw.parquet"
+RAW_DIR = "warehouse/events_raw"
+RAW_EVENTS = f"{RAW_DIR}/*.parquet"
+MANIFEST = "warehouse/ingest_manifest.json"
 
-def main():
-    os.makedirs("warehouse", exist_ok=True)
-    con = duckdb.connect(WAREHOUSE)
+# Silver projection, shared by the full rebuild and the incremental append
+SILVER_SELECT = """
+    SELECT
+        event_id,
+        match_id,
+        player_id,
+        map_type,
+        civilization,
+        civilization_category,
+        strategy,
+
+        -- Bronze is already typed by the extractor (XES <float>/<int>)
+        elo,
+        CAST(win AS INTEGER) AS win,
+
+        -- Event properties
+        activity,
+        CAST(amount AS INTEGER) AS amount,
+
+        -- Timestamp handling
+        ts AS event_time,
+        EXTRACT(EPOCH FROM (ts - MIN(ts) OVER (PARTITION BY case_id))) AS seconds_since_start,
+
+        CAST("@@index" AS INTEGER) AS event_index,
+        CAST("@@case_index" AS INTEGER) AS case_index
+
+    FROM {source}
+    WHERE activity IS NOT NULL
+    AND match_id IS NOT NULL
+    AND player_id IS NOT NULL
+"""
+
+# Physical order of events_clean: keeps each player-match contiguous so the
+# min/max zonemaps of row groups prune match/player filters
+SILVER_ORDER = "ORDER BY match_id, player_id, seconds_since_start"
+
+SILVER_INDEXES = {
+    "idx_events_player": "player_id",
+    "idx_events_match": "match_id",
+}
+
+def relation_type(con, name):
+    """'BASE TABLE', 'VIEW' or None for a relation in the main schema."""
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?",
+        [name],
+    ).fetchone()
+    return row[0] if row else None
+
+def table_exists(con, name):
+    return relation_type(con, name) is not None
+
+def create_bronze_view(con):
+    """
+    Expose bronze as a view over the Parquet parts instead of copying them into
+    DuckDB. Queries on it (events_clean creation) get projection and filter
+    pushdown into the Parquet scan. The view stores the absolute path of the
+    parts, so it works from any working directory on this machine (not in a
+    copy of the database elsewhere, e.g. MotherDuck); every run recreates it.
+    """
+    if relation_type(con, "bronze") == "BASE TABLE":
+        con.execute("DROP TABLE bronze")  # materialized copy from older runs
+    raw_events = os.path.abspath(RAW_EVENTS).replace("'", "''")
+    con.execute(f"CREATE OR REPLACE VIEW bronze AS SELECT * FROM read_parquet('{raw_events}')")
+
+def load_manifest():
+    """The ingestion manifest written by extract_xes.py, None if missing."""
+    if not os.path.exists(MANIFEST):
+        return None
+    with open(MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    # 1. Bronze = raw parquet
-    con.execute("DROP TABLE IF EXISTS bronze")
-    con.execute(f"CREATE TABLE bronze AS SELECT * FROM '{RAW_EVENTS}'")
+def manifest_parts(manifest):
+    """
+    {part: version} of the bronze parts listed in the manifest. The version
+    (bronze schema and source file hash) changes whenever a part is rewritten.
+    """
+    return {
+        part: f"{manifest.get('schema')}:{entry['sha256']}"
+        for entry in manifest.get("files", {}).values()
+        for part in entry["parts"]
+    }
 
-    # 2. Silver = cleaned events
+def loaded_parts(con):
+    """{part: version} of the bronze parts already loaded into events_clean."""
+    if not table_exists(con, "silver_parts"):
+        return {}
+    return dict(con.execute("SELECT part, version FROM silver_parts").fetchall())
+
+def record_parts(con, parts):
+    con.execute("CREATE TABLE IF NOT EXISTS silver_parts (part VARCHAR, version VARCHAR)")
+    if parts:
+        con.executemany("INSERT INTO silver_parts VALUES (?, ?)", sorted(parts.items()))
+
+def set_indexes(con, keep):
+    """Create or drop the ART indexes on events_clean."""
+    for name, column in SILVER_INDEXES.items():
+        if keep:
+            con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON events_clean({column})")
+        else:
+            con.execute(f"DROP INDEX IF EXISTS {name}")
+
+def full_refresh(con, parts, indexes=False):
+    # 1. Bronze = view over the raw parquet parts (zero-copy)
+    create_bronze_view(con)
+
+    # 2. Silver = cleaned events, clustered by player-match
     con.execute("DROP TABLE IF EXISTS events_clean")
+    con.execute("CREATE TABLE events_clean AS SELECT * FROM ("
+                + SILVER_SELECT.format(source="bronze") + ") " + SILVER_ORDER)
+
+    # Gold has to be rebuilt from scratch after a full refresh
+    con.execute("DROP TABLE IF EXISTS events_batch")
+    con.execute("DROP TABLE IF EXISTS silver_parts")
+    record_parts(con, parts)
+
+    # 3. Optional ART indexes (zonemaps on the sorted layout usually suffice)
+    set_indexes(con, indexes)
+
+def incremental_refresh(con, pending):
+    """
+    Append the events of bronze parts not loaded yet ({part: version}) to
+    events_clean and stage them in events_batch for the incremental gold
+    refresh (read_metrics.py). Events already present in events_clean (same
+    event_id) are skipped; a player trace of a known match is appended. The parts are recorded in silver_parts in the same transaction,
+    so a batch is applied exactly once however many extract runs preceded it.
+    """
+    create_bronze_view(con)
+    con.execute("CREATE TABLE IF NOT EXISTS events_batch AS SELECT * FROM events_clean LIMIT 0")
+    if not pending:
+        return 0
+
+    paths = ", ".join("'" + f"{RAW_DIR}/{p}".replace("'", "''") + "'" for p in sorted(pending))
+    con.execute(f"CREATE OR REPLACE TEMP VIEW bronze_batch AS SELECT * FROM read_parquet([{paths}])")
+    con.begin()
     con.execute("""
-        CREATE TABLE events_clean AS
-        SELECT
-            event_id,
-            match_id,
-            player_id,
-            map_type,
-            civilization,
-            civilization_category,
-            strategy,
-
-            -- Elo (rank) as float
-            TRY_CAST(elo AS DOUBLE) AS elo,
-
-            -- Win flag normalized
-            CASE
-                WHEN LOWER(CAST(win AS VARCHAR)) IN ('1','true') THEN 1
-                WHEN LOWER(CAST(win AS VARCHAR)) IN ('0','false') THEN 0
-                ELSE NULL
-            END AS win,
-
-            -- Event properties
-            activity,
-            TRY_CAST(amount AS INTEGER) AS amount,
-
-            -- Timestamp handling
-            ts AS event_time,
-            EXTRACT(EPOCH FROM (ts - MIN(ts) OVER (PARTITION BY case_id))) AS seconds_since_start,
-
-            TRY_CAST("@@index" AS INTEGER) AS event_index,
-            TRY_CAST("@@case_index" AS INTEGER) AS case_index
-
-        FROM bronze
-        WHERE activity IS NOT NULL
-        AND match_id IS NOT NULL
-        AND player_id IS NOT NULL
+        CREATE OR REPLACE TEMP TABLE new_events AS
+    """ + SILVER_SELECT.format(source="bronze_batch") + """
+        AND event_id NOT IN (SELECT event_id FROM events_clean)
     """)
+    con.execute(f"INSERT INTO events_clean SELECT * FROM new_events {SILVER_ORDER}")
+    con.execute("INSERT INTO events_batch SELECT * FROM new_events")
+    record_parts(con, pending)
+    con.commit()
+    return con.execute("SELECT COUNT(DISTINCT (match_id, player_id)) FROM new_events").fetchone()[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the silver events_clean table from bronze parts")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only the bronze parts not loaded yet")
+    parser.add_argument("--indexes", action="store_true",
+                        help="keep ART indexes on events_clean(player_id) and (match_id)")
+    args = parser.parse_args(argv)
+
+    os.makedirs("warehouse", exist_ok=True)
+    con = duckdb.connect(WAREHOUSE)
+
+    manifest = load_manifest()
+    parts = manifest_parts(manifest) if manifest is not None else {}
+    pending = None
+    if args.incremental and manifest is None:
+        print("No ingestion manifest found, running a full refresh.")
+    elif args.incremental and not table_exists(con, "events_clean"):
+        print("No events_clean table yet, running a full refresh.")
+    elif args.incremental:
+        # Parts listed in the manifest but not loaded yet, whatever extract run wrote them
+        loaded = loaded_parts(con)
+        if any(parts.get(part) != version for part, version in loaded.items()):
+            print("Bronze parts were removed or replaced since the last load, running a full refresh.")
+        else:
+            pending = {p: v for p, v in parts.items() if p not in loaded}
 
-    # 3. Index for faster analysis
-    con.execute("CREATE INDEX IF NOT EXISTS idx_events_player ON events_clean(player_id)")
-    con.execute("CREATE INDEX IF NOT EXISTS idx_events_match ON events_clean(match_id)")
+    if pending is None:
+        full_refresh(con, parts, indexes=args.indexes)
+    else:
+        set_indexes(con, args.indexes)
+        new_traces = incremental_refresh(con, pending)
+        print(f"Appended events of {new_traces:,} player-matches from {len(pending)} bronze parts to events_clean")
 
     # Debug
     print(con.execute("SELECT * FROM events_clean LIMIT 10").fetchdf())
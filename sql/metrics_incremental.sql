@@ -0,0 +1,11 @@
+-- Incremental gold refresh: merges the pending silver batch (events_batch,
+-- staged by transform_events.py --incremental) into the gold tables.
+-- Run before sql/metrics_merge.sql (see read_metrics.py). Only the
+-- player-matches with events in the batch are recomputed, from all their
+-- events in events_clean, so a player trace that arrives after the rest of
+-- its match is merged too.
+
+CREATE OR REPLACE TEMP VIEW fact_source AS
+SELECT *
+FROM events_clean
+WHERE (match_id, player_id) IN (SELECT DISTINCT match_id, player_id FROM events_batch);
@@ -0,0 +1,407 @@
+-- Gold tables from the player-matches of the fact_source view, defined by
+-- sql/metrics.sql (full rebuild: all of events_clean) or
+-- sql/metrics_incremental.sql (the player-matches of the pending batch).
+-- Per-match tables are upserted for these player-matches. Additive partial
+-- aggregates (gold.*_stats, gold.elo_cube) get the new facts added and the
+-- facts they replace subtracted, so they never need a rescan of
+-- events_clean; the published tables are rolled up from them.
+
+------------------------------------------------------------
+-- 0. Player-match facts – the only scan of events_clean
+------------------------------------------------------------
+-- One compact row per player-match; every gold table below is derived from it
+CREATE OR REPLACE TEMP TABLE new_facts AS
+SELECT
+    match_id,
+    player_id,
+    MAX(elo) AS elo,    -- get the player's elo in that match
+    MAX(win) AS win,    -- win flag per match
+    -- Case attributes are constant within a player-match
+    MAX(civilization) AS civilization,
+    MAX(civilization_category) AS civilization_category,
+    MAX(map_type) AS map_type,
+    MAX(strategy) AS strategy,
+    COUNT(*) FILTER (WHERE seconds_since_start <= 600) AS events_first_600s,
+    -- Age-up events (activities containing "age") with their times
+    LIST({'activity': activity, 'seconds': seconds_since_start} ORDER BY seconds_since_start, event_index)
+        FILTER (WHERE REGEXP_MATCHES(LOWER(activity), '(\b)age(\b)')) AS age_ups,
+    -- First 100 actions in time order (bounded top-N, no full sort)
+    MIN_BY(activity, {'seconds': seconds_since_start, 'event_index': event_index}, 100) AS opening
+FROM fact_source
+GROUP BY match_id, player_id;
+
+CREATE TABLE IF NOT EXISTS gold.player_match_facts AS
+SELECT * FROM new_facts LIMIT 0;
+
+-- Facts being replaced, subtracted from the partial aggregates below
+CREATE OR REPLACE TEMP TABLE old_facts AS
+SELECT *
+FROM gold.player_match_facts
+WHERE (match_id, player_id) IN (SELECT match_id, player_id FROM new_facts);
+
+CREATE OR REPLACE TEMP VIEW fact_deltas AS
+SELECT *, 1 AS sign FROM new_facts
+UNION ALL BY NAME
+SELECT *, -1 AS sign FROM old_facts;
+
+DELETE FROM gold.player_match_facts t
+USING new_facts n
+WHERE t.match_id = n.match_id AND t.player_id = n.player_id;
+
+-- Sorted by elo: zonemaps prune the dashboard's Elo range filters (upserted
+-- facts are appended after the sorted ones until the next full rebuild)
+INSERT INTO gold.player_match_facts
+SELECT * FROM new_facts
+ORDER BY elo, match_id, player_id;
+
+------------------------------------------------------------
+-- 1. Per-match tables (upsert)
+------------------------------------------------------------
+-- One row per player-match
+CREATE OR REPLACE TEMP VIEW new_player_match_results AS
+SELECT
+    player_id,
+    match_id,
+    elo,
+    win
+FROM new_facts;
+
+CREATE TABLE IF NOT EXISTS gold.player_match_results AS
+SELECT * FROM new_player_match_results LIMIT 0;
+
+DELETE FROM gold.player_match_results t
+USING new_facts n
+WHERE t.match_id = n.match_id AND t.player_id = n.player_id;
+
+INSERT INTO gold.player_match_results
+SELECT * FROM new_player_match_results;
+
+-- Events per minute (EPM) – first 10 minutes
+CREATE OR REPLACE TEMP VIEW new_apm AS
+SELECT
+    match_id,
+    player_id,
+    events_first_600s * 60.0 / 600 AS apm
+FROM new_facts
+WHERE events_first_600s > 0;
+
+CREATE TABLE IF NOT EXISTS gold.apm AS
+SELECT * FROM new_apm LIMIT 0;
+
+DELETE FROM gold.apm t
+USING new_facts n
+WHERE t.match_id = n.match_id AND t.player_id = n.player_id;
+
+INSERT INTO gold.apm
+SELECT * FROM new_apm;
+
+-- Opening build orders – first 100 actions
+CREATE OR REPLACE TEMP VIEW new_openings AS
+SELECT
+    civilization,
+    civilization_category,
+    map_type,
+    strategy,
+    match_id,
+    player_id,
+    elo,
+    UNNEST(opening) AS activity,
+    UNNEST(RANGE(1, LEN(opening) + 1)) AS action_rank,
+    win
+FROM new_facts
+ORDER BY elo, match_id, player_id, action_rank;
+
+CREATE TABLE IF NOT EXISTS gold.openings AS
+SELECT * FROM new_openings LIMIT 0;
+
+DELETE FROM gold.openings t
+USING new_facts n
+WHERE t.match_id = n.match_id AND t.player_id = n.player_id;
+
+INSERT INTO gold.openings
+SELECT * FROM new_openings;
+
+-- Opening sequences – one row per player-match.
+-- Stable, dense activity codes (1..n): existing codes are kept and new
+-- activities are appended, so stored sequences never need re-encoding
+CREATE TABLE IF NOT EXISTS gold.activity_dict (
+    activity_code SMALLINT,
+    activity VARCHAR
+);
+
+INSERT INTO gold.activity_dict
+SELECT
+    CAST((SELECT COALESCE(MAX(activity_code), 0) FROM gold.activity_dict)
+        + ROW_NUMBER() OVER (ORDER BY activity) AS SMALLINT) AS activity_code,
+    activity
+FROM (SELECT DISTINCT UNNEST(opening) AS activity FROM new_facts)
+WHERE activity NOT IN (SELECT activity FROM gold.activity_dict);
+
+-- Build order as a list of activity codes (decode with gold.activity_dict)
+CREATE OR REPLACE TEMP VIEW new_opening_sequences AS
+WITH codes AS (
+    SELECT MAP(LIST(activity), LIST(activity_code)) AS code_of
+    FROM gold.activity_dict
+)
+SELECT
+    f.match_id,
+    f.player_id,
+    f.elo,
+    f.win,
+    f.civilization,
+    f.civilization_category,
+    f.map_type,
+    f.strategy,
+    LIST_TRANSFORM(f.opening, a -> codes.code_of[a]) AS build_order
+FROM new_facts f, codes
+ORDER BY f.elo, f.match_id, f.player_id;
+
+CREATE TABLE IF NOT EXISTS gold.opening_sequences AS
+SELECT * FROM new_opening_sequences LIMIT 0;
+
+DELETE FROM gold.opening_sequences t
+USING new_facts n
+WHERE t.match_id = n.match_id AND t.player_id = n.player_id;
+
+INSERT INTO gold.opening_sequences
+SELECT * FROM new_opening_sequences;
+
+------------------------------------------------------------
+-- 2. Partial aggregates
+------------------------------------------------------------
+-- Per player: MAX(elo) cannot be un-merged, so the players of the upserted
+-- facts are recomputed from gold.player_match_facts
+CREATE OR REPLACE TEMP TABLE affected_players AS
+SELECT DISTINCT player_id FROM new_facts;
+
+CREATE OR REPLACE TEMP VIEW new_player_stats AS
+SELECT
+    player_id,
+    MAX(elo) AS max_elo,
+    COUNT(*) AS matches,
+    SUM(win) AS wins
+FROM gold.player_match_facts
+WHERE player_id IN (SELECT player_id FROM affected_players)
+GROUP BY player_id;
+
+CREATE TABLE IF NOT EXISTS gold.player_stats AS
+SELECT * FROM new_player_stats LIMIT 0;
+
+DELETE FROM gold.player_stats
+WHERE player_id IN (SELECT player_id FROM affected_players);
+
+INSERT INTO gold.player_stats
+SELECT * FROM new_player_stats;
+
+CREATE OR REPLACE TEMP VIEW new_player_strategy_stats AS
+SELECT
+    player_id,
+    strategy,
+    COUNT(*) AS matches_with_strategy
+FROM gold.player_match_facts
+WHERE strategy IS NOT NULL
+AND player_id IN (SELECT player_id FROM affected_players)
+GROUP BY player_id, strategy;
+
+CREATE TABLE IF NOT EXISTS gold.player_strategy_stats AS
+SELECT * FROM new_player_strategy_stats LIMIT 0;
+
+DELETE FROM gold.player_strategy_stats
+WHERE player_id IN (SELECT player_id FROM affected_players);
+
+INSERT INTO gold.player_strategy_stats
+SELECT * FROM new_player_strategy_stats;
+
+-- Additive sums and counts: merged with the signed facts (+new, -replaced);
+-- groups whose count drops to zero are removed
+CREATE OR REPLACE TEMP VIEW age_timing_deltas AS
+SELECT
+    civilization,
+    age_up.activity,
+    SUM(sign * age_up.seconds) AS total_seconds,
+    CAST(SUM(CASE WHEN age_up.seconds IS NOT NULL THEN sign ELSE 0 END) AS BIGINT) AS events
+FROM (
+    SELECT civilization, sign, UNNEST(age_ups) AS age_up
+    FROM fact_deltas
+)
+GROUP BY civilization, age_up.activity;
+
+CREATE TABLE IF NOT EXISTS gold.age_timing_stats AS
+SELECT * FROM age_timing_deltas LIMIT 0;
+
+CREATE OR REPLACE TABLE gold.age_timing_stats AS
+SELECT
+    civilization,
+    activity,
+    SUM(total_seconds) AS total_seconds,
+    CAST(SUM(events) AS BIGINT) AS events
+FROM (
+    SELECT * FROM gold.age_timing_stats
+    UNION ALL BY NAME
+    SELECT * FROM age_timing_deltas
+)
+GROUP BY civilization, activity
+HAVING SUM(events) <> 0;
+
+CREATE OR REPLACE TEMP VIEW civ_deltas AS
+SELECT
+    civilization,
+    CAST(SUM(sign) AS BIGINT) AS games,
+    CAST(SUM(CASE WHEN win = 1 THEN sign ELSE 0 END) AS BIGINT) AS wins
+FROM fact_deltas
+WHERE civilization IS NOT NULL
+GROUP BY civilization;
+
+CREATE TABLE IF NOT EXISTS gold.civ_stats AS
+SELECT * FROM civ_deltas LIMIT 0;
+
+CREATE OR REPLACE TABLE gold.civ_stats AS
+SELECT
+    civilization,
+    CAST(SUM(games) AS BIGINT) AS games,
+    CAST(SUM(wins) AS BIGINT) AS wins
+FROM (
+    SELECT * FROM gold.civ_stats
+    UNION ALL BY NAME
+    SELECT * FROM civ_deltas
+)
+GROUP BY civilization
+HAVING SUM(games) <> 0;
+
+CREATE OR REPLACE TEMP VIEW strategy_deltas AS
+SELECT
+    strategy,
+    civilization,
+    CAST(SUM(sign) AS BIGINT) AS games,
+    CAST(SUM(CASE WHEN win = 1 THEN sign ELSE 0 END) AS BIGINT) AS wins
+FROM fact_deltas
+WHERE strategy IS NOT NULL
+GROUP BY strategy, civilization;
+
+CREATE TABLE IF NOT EXISTS gold.strategy_stats AS
+SELECT * FROM strategy_deltas LIMIT 0;
+
+CREATE OR REPLACE TABLE gold.strategy_stats AS
+SELECT
+    strategy,
+    civilization,
+    CAST(SUM(games) AS BIGINT) AS games,
+    CAST(SUM(wins) AS BIGINT) AS wins
+FROM (
+    SELECT * FROM gold.strategy_stats
+    UNION ALL BY NAME
+    SELECT * FROM strategy_deltas
+)
+GROUP BY strategy, civilization
+HAVING SUM(games) <> 0;
+
+-- Elo-bucket cube: additive measures for the dashboard filters, with Elo in
+-- buckets of 100 (the dashboard rolls it up instead of filtering
+-- player-match rows)
+CREATE OR REPLACE TEMP VIEW elo_cube_deltas AS
+SELECT
+    CAST(FLOOR(elo / 100) * 100 AS INTEGER) AS elo_bucket,
+    civilization,
+    map_type,
+    strategy,
+    CAST(SUM(sign) AS BIGINT) AS games,
+    CAST(SUM(CASE WHEN win = 1 THEN sign ELSE 0 END) AS BIGINT) AS wins,
+    CAST(SUM(CASE WHEN events_first_600s > 0 THEN sign ELSE 0 END) AS BIGINT) AS apm_games,
+    CAST(SUM(sign * events_first_600s) AS BIGINT) AS events_first_600s
+FROM fact_deltas
+GROUP BY ALL;
+
+CREATE TABLE IF NOT EXISTS gold.elo_cube AS
+SELECT * FROM elo_cube_deltas LIMIT 0;
+
+CREATE OR REPLACE TABLE gold.elo_cube AS
+SELECT
+    elo_bucket,
+    civilization,
+    map_type,
+    strategy,
+    CAST(SUM(games) AS BIGINT) AS games,
+    CAST(SUM(wins) AS BIGINT) AS wins,
+    CAST(SUM(apm_games) AS BIGINT) AS apm_games,
+    CAST(SUM(events_first_600s) AS BIGINT) AS events_first_600s
+FROM (
+    SELECT * FROM gold.elo_cube
+    UNION ALL BY NAME
+    SELECT * FROM elo_cube_deltas
+)
+GROUP BY ALL
+HAVING SUM(games) <> 0
+ORDER BY elo_bucket, civilization;
+
+------------------------------------------------------------
+-- 3. Roll partial aggregates up into the published tables
+------------------------------------------------------------
+-- Player summary (max Elo, total matches, wins, loses, winrate)
+CREATE OR REPLACE TABLE gold.player_summary AS
+WITH strategy_list AS (
+    SELECT
+        player_id,
+        STRING_AGG(strategy || ' - ' || matches_with_strategy, ', ' ORDER BY strategy) AS used_strategies
+    FROM gold.player_strategy_stats
+    GROUP BY player_id
+)
+SELECT
+    ps.player_id,
+    ps.max_elo,
+    ps.matches AS total_matches,
+    ps.wins AS total_wins,
+    ps.matches - ps.wins AS total_loses,
+    ps.wins * 1.0 / ps.matches AS winrate,
+    sl.used_strategies
+FROM gold.player_stats ps
+LEFT JOIN strategy_list sl ON ps.player_id = sl.player_id
+ORDER BY max_elo DESC;
+
+-- Age timings – all activities containing "age"
+CREATE OR REPLACE TABLE gold.age_timings AS
+SELECT
+    civilization,
+    activity,
+    ROUND(total_seconds / events / 60.0, 2) AS avg_time_mins
+FROM gold.age_timing_stats
+ORDER BY civilization, avg_time_mins;
+
+-- Winrate & playrate by civilization – dynamic civilizations
+CREATE OR REPLACE TABLE gold.winrate_civ AS
+SELECT
+    civilization,
+    wins * 1.0 / games AS winrate,
+    games AS total_games,
+    games * 1.0 / SUM(games) OVER () AS playrate
+FROM gold.civ_stats
+ORDER BY winrate DESC;
+
+-- Winrate by strategy
+CREATE OR REPLACE TABLE gold.winrate_strat AS
+SELECT
+    strategy,
+    SUM(wins) * 1.0 / SUM(games) AS winrate,
+    CAST(SUM(games) AS BIGINT) AS total_games,
+    STRING_AGG(DISTINCT civilization, ', ' ORDER BY civilization) AS civilizations,
+FROM gold.strategy_stats
+GROUP BY strategy
+ORDER BY winrate DESC;
+
+------------------------------------------------------------
+-- 4. Dashboard filter dimensions and refresh stamp
+------------------------------------------------------------
+-- One tiny row with the filter choices, so the dashboard never scans
+-- events_clean to fill its widgets
+CREATE OR REPLACE TABLE gold.filter_dimensions AS
+SELECT
+    LIST(DISTINCT civilization ORDER BY civilization) FILTER (WHERE civilization IS NOT NULL) AS civilizations,
+    MIN(elo) AS min_elo,
+    MAX(elo) AS max_elo
+FROM gold.player_match_facts;
+
+-- Version stamp of the last refresh: the dashboard's query cache is keyed on it
+CREATE OR REPLACE TABLE gold.warehouse_version AS
+SELECT NOW() AS refreshed_at;
+
+-- The pending batch, if any, has been applied
+DROP TABLE IF EXISTS events_batch;
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Pipeline scripts are run directly (python pipelines/<script>.py), so make
+# them importable the same way from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "pipelines"))
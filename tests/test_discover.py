@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import discover_strategies
+
+
+SEQUENCES = [
+    "Queue Villager,Queue Villager,Build house,Queue Villager,Build lumber-camp",
+    "Queue Villager,Build house,Queue Villager,Queue Villager,Build house,Build mill",
+    "Build barracks,Queue Militia",                 # shorter than the n-gram
+    "",
+    ["Build house", "Build house", "Build house", "Build house"],
+]
+
+@pytest.mark.parametrize("ngram_n", [1, 3, 5])
+def test_batch_signatures_match_minhash(ngram_n):
+    signatures = discover_strategies.minhash_signatures(SEQUENCES, ngram_n, num_perm=64)
+    expected = np.array([discover_strategies.make_minhash(s, ngram_n, 64).hashvalues for s in SEQUENCES])
+    assert signatures.shape == (len(SEQUENCES), 64)
+    assert signatures.dtype == np.uint64
+    assert (signatures == expected).all()
+
+def test_batch_signatures_blocks(monkeypatch):
+    sequences = SEQUENCES * 20
+    expected = discover_strategies.minhash_signatures(sequences)
+    monkeypatch.setattr(discover_strategies, "MINHASH_BATCH_ROWS", 3)
+    assert (discover_strategies.minhash_signatures(sequences) == expected).all()
+
+def test_shingling_blocks(monkeypatch):
+    sequences = SEQUENCES * 20
+    tokens, token_ids, offsets = discover_strategies.shingle_sequences(sequences)
+    monkeypatch.setattr(discover_strategies, "MINHASH_BATCH_ROWS", 3)
+    blocked = discover_strategies.shingle_sequences(sequences)
+    assert blocked[0] == tokens
+    assert (blocked[1] == token_ids).all() and (blocked[2] == offsets).all()
+
+def test_batch_signatures_from_activity_codes():
+    names = sorted({a for s in SEQUENCES for a in (s.split(',') if isinstance(s, str) else s)})
+    code_of = {a: i + 1 for i, a in enumerate(names)}
+    codes = [[code_of[a] for a in (s.split(',') if isinstance(s, str) else s)] for s in SEQUENCES]
+    assert (discover_strategies.minhash_signatures(codes, names=names)
+            == discover_strategies.minhash_signatures(SEQUENCES)).all()
+
+def brute_force_components(signatures, lsh_threshold):
+    """Union of sequences sharing any band, pair by pair."""
+    bands, rows = discover_strategies.lsh_bands(signatures.shape[1], lsh_threshold)
+    n = len(signatures)
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if any((signatures[i, b * rows:(b + 1) * rows] == signatures[j, b * rows:(b + 1) * rows]).all()
+                   for b in range(bands)):
+                parent[find(j)] = find(i)
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: g[0])
+
+@pytest.mark.parametrize("lsh_threshold", [0.3, 0.5, 0.8])
+def test_lsh_candidate_groups_are_band_components(lsh_threshold):
+    rng = np.random.default_rng(0)
+    base = [rng.choice(20, size=60) for _ in range(5)]
+    sequences = []
+    for _ in range(60):
+        seq = base[rng.integers(len(base))].copy()
+        mutate = rng.random(len(seq)) < 0.2
+        seq[mutate] = rng.integers(20, size=mutate.sum())
+        sequences.append([f"a{c}" for c in seq])
+    signatures = discover_strategies.minhash_signatures(sequences, num_perm=64)
+
+    groups = discover_strategies.lsh_candidate_groups(signatures, lsh_threshold)
+    assert [list(g) for g in groups] == brute_force_components(signatures, lsh_threshold)
+
+    stats = discover_strategies.lsh_bucket_stats(signatures, lsh_threshold)
+    bands, _ = discover_strategies.lsh_bands(64, lsh_threshold)
+    assert len(stats) == bands
+    assert (stats["max_bucket"] <= max((len(g) for g in groups), default=1)).all()
+
+def test_ngram_matrix_counts_activity_ngrams():
+    from collections import Counter
+    X = discover_strategies.ngram_matrix(SEQUENCES, ngram_n=2)
+    tokens, _, _ = discover_strategies.shingle_sequences(SEQUENCES, ngram_n=2)
+    assert X.shape == (len(SEQUENCES), len(tokens))
+    for row, seq in enumerate(SEQUENCES):
+        actions = seq.split(',') if isinstance(seq, str) else seq
+        expected = Counter("_".join(actions[i:i + 2]) for i in range(len(actions) - 1))
+        got = {tokens[c]: v for c, v in zip(X[row].indices, X[row].data)}
+        assert got == expected
+
+def test_sparse_cluster_stats_match_dense():
+    from scipy.sparse import csr_matrix
+    from sklearn.metrics.pairwise import cosine_similarity
+    rng = np.random.default_rng(0)
+    counts = rng.integers(1, 5, size=(40, 300)) * (rng.random((40, 300)) < 0.05)
+    counts[3] = 0  # an all-zero row
+    X = csr_matrix(counts)
+
+    sim = cosine_similarity(X)
+    expected_mean = sim[np.triu_indices_from(sim, k=1)].mean()
+    assert discover_strategies.mean_pairwise_cosine(X) == pytest.approx(expected_mean)
+    assert discover_strategies.mean_pairwise_cosine(X[:1]) == 1.0
+
+    dense = X.toarray()
+    expected_medoid = np.argmin(np.linalg.norm(dense - dense.mean(axis=0), axis=1))
+    assert discover_strategies.sparse_medoid(X) == expected_medoid
+
+def clustered_openings(count=300, seed=0):
+    """Comma-joined openings drawn around a few base orders."""
+    rng = np.random.default_rng(seed)
+    base = [rng.choice(30, size=40) for _ in range(4)]
+    rows = []
+    for i in range(count):
+        seq = base[i % len(base)].copy()
+        mutate = rng.random(len(seq)) < 0.1
+        seq[mutate] = rng.integers(30, size=mutate.sum())
+        rows.append({
+            "match_id": f"m{i}",
+            "player_id": f"p{i % 7}",
+            "win": int(rng.random() < 0.5),
+            "build_order": (seq + 1).astype(np.int16),
+            "build_order_seq": ",".join(f"a{c}" for c in seq),
+        })
+    return pd.DataFrame(rows)
+
+def test_parallel_and_graph_dbscan_match_serial():
+    df = clustered_openings()
+    params = dict(dbscan_eps=0.3, dbscan_min_samples=5, min_matches_per_player=2)
+    serial = discover_strategies.cluster_unknown_sequences(df, **params)
+    assert not serial.empty
+    parallel = discover_strategies.cluster_unknown_sequences(df, workers=2, **params)
+    graph = discover_strategies.cluster_unknown_sequences(df, dbscan_graph=True, **params)
+    pd.testing.assert_frame_equal(serial, parallel)
+    pd.testing.assert_frame_equal(serial, graph)
+
+def test_signature_cache_hashes_only_new_or_changed_sequences(monkeypatch):
+    import duckdb
+    con = duckdb.connect()
+    df = clustered_openings(count=40)
+
+    hashed = []
+    compute = discover_strategies.minhash_signatures
+
+    def counting(sequences, *args, **kwargs):
+        hashed.append(len(sequences))
+        return compute(sequences, *args, **kwargs)
+
+    monkeypatch.setattr(discover_strategies, "minhash_signatures", counting)
+    expected = compute(df["build_order_seq"].tolist())
+
+    assert (discover_strategies.cached_minhash_signatures(con, df) == expected).all()
+    assert (discover_strategies.cached_minhash_signatures(con, df) == expected).all()
+    assert hashed == [40]
+
+    # One changed opening, one new player-match, one dropped
+    changed = df.copy()
+    changed.loc[0, "build_order_seq"] = "a1,a2,a3,a4"
+    changed = pd.concat([changed.iloc[:-1], df.iloc[[5]].assign(match_id="new")], ignore_index=True)
+    signatures = discover_strategies.cached_minhash_signatures(con, changed)
+    assert hashed == [40, 2]
+    assert (signatures == compute(changed["build_order_seq"].tolist())).all()
+    assert con.execute("SELECT COUNT(*) FROM cache.minhash_signatures").fetchone()[0] == len(changed)
+
+    # Other parameters are cached side by side, stale ones are evicted
+    discover_strategies.cached_minhash_signatures(con, df, num_perm=64)
+    assert con.execute("SELECT COUNT(DISTINCT num_perm) FROM cache.minhash_signatures").fetchone()[0] == 2
+    discover_strategies.cached_minhash_signatures(con, df, ttl_days=0)
+    assert con.execute("SELECT DISTINCT num_perm FROM cache.minhash_signatures").fetchall() == [(128,)]
+
+def recomputed_cluster_stats(con, df):
+    """Cluster stats recomputed from scratch from the tracked membership."""
+    members = con.execute(
+        f"SELECT match_id, player_id, cluster_id FROM {discover_strategies.DISCOVERY_MEMBERS} WHERE cluster_id IS NOT NULL"
+    ).fetchdf().merge(df, on=["match_id", "player_id"])
+    reps = con.execute(f"SELECT cluster_id, rep_sequence FROM {discover_strategies.DISCOVERY_CLUSTERS}").fetchdf()
+    rows = []
+    for cluster_id, group in members.groupby("cluster_id"):
+        sequences = group["build_order_seq"].tolist()
+        rep = reps.loc[reps["cluster_id"] == cluster_id, "rep_sequence"].item()
+        X = discover_strategies.ngram_matrix(sequences)
+        jaccard, lev = discover_strategies.scoring.score_to_reference(
+            sequences + [rep], [len(sequences)] * len(sequences) + [len(sequences)])
+        rows.append({
+            "cluster_id": cluster_id,
+            "num_matches": len(group),
+            "winrate": group["win"].mean(),
+            "num_players": group["player_id"].nunique(),
+            "avg_ngram": discover_strategies.mean_pairwise_cosine(X),
+            "avg_jaccard": jaccard[:-1].mean(),
+            "avg_levenshtein": lev[:-1].mean(),
+        })
+    return pd.DataFrame(rows).set_index("cluster_id").sort_index()
+
+def test_incremental_discovery_updates_running_aggregates():
+    import duckdb
+    con = duckdb.connect()
+    df = clustered_openings(count=400)
+    params = dict(ngram_n=3, dbscan_eps=0.3)
+    first = df.iloc[:320]
+
+    clusters, members = discover_strategies.cluster_unknown_sequences(
+        first, dbscan_min_samples=5, with_members=True, **params)
+    assert members["is_representative"].sum() == len(clusters)
+    discover_strategies.save_discovery_state(con, first, clusters, members, **params)
+    discover_strategies.publish_clusters(con)
+    published = con.execute("SELECT * FROM gold.clustered_unknown_strategies").fetchdf()
+    pd.testing.assert_frame_equal(published.set_index("cluster_id").sort_index(),
+                                  clusters.set_index("cluster_id").sort_index(), check_dtype=False)
+
+    # Drill-down tables: members and the medoid as activity codes
+    assert con.execute("SELECT COUNT(*) FROM gold.cluster_members").fetchone()[0] == len(members)
+    reps = con.execute("SELECT * FROM gold.cluster_representatives ORDER BY cluster_id").fetchdf()
+    expected = members[members["is_representative"]].merge(first, on=["match_id", "player_id"]).sort_values("cluster_id")
+    assert reps["match_id"].tolist() == expected["match_id"].tolist()
+    assert [list(b) for b in reps["build_order"]] == [list(b) for b in expected["build_order"]]
+
+    # A new batch is routed without reclustering
+    assert discover_strategies.assign_new_openings(con, df, **params)
+    tracked, assigned = con.execute(
+        f"SELECT COUNT(*), COUNT(cluster_id) FROM {discover_strategies.DISCOVERY_MEMBERS}").fetchone()
+    assert tracked == len(df)
+    assert assigned > members.shape[0]
+    discover_strategies.publish_clusters(con)
+    published = con.execute("SELECT * FROM gold.clustered_unknown_strategies").fetchdf()
+    pd.testing.assert_frame_equal(published.set_index("cluster_id").sort_index(),
+                                  recomputed_cluster_stats(con, df), check_dtype=False)
+
+    # Openings leaving the unknown set or changed parameters force a full recluster
+    assert not discover_strategies.assign_new_openings(con, df.iloc[1:], **params)
+    assert not discover_strategies.assign_new_openings(con, df, ngram_n=2, dbscan_eps=0.3)
+    assert not discover_strategies.assign_new_openings(con, df, min_matches_per_player=3, **params)
+
+def test_incremental_discovery_reroutes_changed_openings():
+    import duckdb
+    con = duckdb.connect()
+    df = clustered_openings(count=320)
+    params = dict(ngram_n=3, dbscan_eps=0.3)
+    noise = df.iloc[[0]].assign(match_id="noise", build_order_seq=",".join(f"b{c}" for c in range(40)))
+    df = pd.concat([df, noise], ignore_index=True)
+
+    clusters, members = discover_strategies.cluster_unknown_sequences(
+        df, dbscan_min_samples=5, with_members=True, **params)
+    discover_strategies.save_discovery_state(con, df, clusters, members, **params)
+    cluster_of = dict(con.execute(
+        f"SELECT match_id, cluster_id FROM {discover_strategies.DISCOVERY_MEMBERS}").fetchall())
+    assert cluster_of["noise"] is None
+    first, second = [i for i, m in enumerate(df["match_id"]) if cluster_of[m] is not None][:2]
+
+    # A clustered opening that changed (e.g. a late trace merged into its match)
+    changed = df.copy()
+    changed.loc[second, "build_order_seq"] = changed.loc[first, "build_order_seq"]
+    assert not discover_strategies.assign_new_openings(con, changed, **params)
+
+    # An unassigned opening that changed is routed again
+    changed = df.copy()
+    changed.loc[len(df) - 1, "build_order_seq"] = changed.loc[first, "build_order_seq"]
+    assert discover_strategies.assign_new_openings(con, changed, **params)
+    tracked, cluster_id = con.execute(f"""
+        SELECT COUNT(*), ANY_VALUE(cluster_id) FILTER (WHERE match_id = 'noise')
+        FROM {discover_strategies.DISCOVERY_MEMBERS}
+    """).fetchone()
+    assert tracked == len(df)
+    assert cluster_id == cluster_of[df.loc[first, "match_id"]]
+    discover_strategies.publish_clusters(con)
+    published = con.execute("SELECT * FROM gold.clustered_unknown_strategies").fetchdf()
+    pd.testing.assert_frame_equal(published.set_index("cluster_id").sort_index(),
+                                  recomputed_cluster_stats(con, changed), check_dtype=False)
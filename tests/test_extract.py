@@ -0,0 +1,160 @@
+import json
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pathlib import Path
+
+import extract_xes
+
+TEST_XES = Path(__file__).parent / "test_data.xes"
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    shutil.copy(TEST_XES, data / "test_data.xes")
+    monkeypatch.setattr(extract_xes, "DATA_DIR", data)
+    monkeypatch.setattr(extract_xes, "OUT_DIR", tmp_path / "warehouse")
+    monkeypatch.setattr(extract_xes, "BRONZE_PATH", tmp_path / "warehouse" / "events_raw.parquet")
+    monkeypatch.setattr(extract_xes, "BRONZE_DIR", tmp_path / "warehouse" / "events_raw")
+    monkeypatch.setattr(extract_xes, "MANIFEST_PATH", tmp_path / "warehouse" / "ingest_manifest.json")
+    (tmp_path / "warehouse").mkdir()
+    return data
+
+def read_parts(bronze_dir):
+    return {p.name: p.read_bytes() for p in sorted(bronze_dir.glob("*.parquet"))}
+
+def test_streaming_writer_one_row_group_per_chunk(data_dir, monkeypatch):
+    monkeypatch.setattr(extract_xes, "CHUNK_SIZE", 500)
+    extract_xes.main([])
+    pf = pq.ParquetFile(extract_xes.BRONZE_DIR / "test_data-0000.parquet")
+    assert pf.schema_arrow == extract_xes.BRONZE_SCHEMA
+    assert pf.metadata.num_rows == 1286
+    assert pf.metadata.num_row_groups == 3
+
+def test_parallel_split_matches_serial(data_dir, monkeypatch):
+    extract_xes.main([])
+    whole = pq.read_table(extract_xes.BRONZE_DIR).to_pandas()
+
+    # Split the small test file into several trace-aligned pieces
+    monkeypatch.setattr(extract_xes, "SPLIT_BYTES", 60_000)
+    extract_xes.main(["--workers", "1", "--full"])
+    serial = read_parts(extract_xes.BRONZE_DIR)
+    extract_xes.main(["--workers", "3", "--full"])
+    parallel = read_parts(extract_xes.BRONZE_DIR)
+
+    assert len(serial) > 1
+    assert serial == parallel
+
+    split = pq.read_table(extract_xes.BRONZE_DIR).to_pandas()
+    assert split["event_id"].is_unique
+    assert sorted(split["event_id"]) == sorted(whole["event_id"])
+
+def test_fast_engine_matches_legacy(data_dir, monkeypatch):
+    monkeypatch.setattr(extract_xes, "CHUNK_SIZE", 500)
+    extract_xes.main(["--engine", "legacy"])
+    legacy = pq.read_table(extract_xes.BRONZE_DIR).to_pandas()
+    extract_xes.main(["--engine", "fast", "--full"])
+    fast = pq.read_table(extract_xes.BRONZE_DIR).to_pandas()
+    assert legacy.equals(fast)
+
+def test_bronze_columns_are_typed():
+    batch = extract_xes.columns_to_record_batch({
+        "activity": ["Build house", "Build house"],
+        "ts": ["2023-01-01T00:00:00.728000+00:00", "not a date"],
+        "elo": ["1500.5", None],
+        "win": ["1", "oops"],
+    })
+    assert batch.schema == extract_xes.BRONZE_SCHEMA
+    assert batch.column("activity").dictionary.to_pylist() == ["Build house"]
+    assert batch.column("elo").to_pylist() == [1500.5, None]
+    assert batch.column("win").to_pylist() == [1, None]
+    assert batch.column("ts").null_count == 1
+    assert batch.column("match_id").null_count == 2
+    assert batch.column("unparsed_values").to_pylist() == [None, [("ts", "not a date"), ("win", "oops")]]
+
+def test_non_integer_values_are_not_truncated():
+    batch = extract_xes.columns_to_record_batch({"amount": ["2", "1.5", " 3 "], "win": ["0", "1", "0.9"]})
+    assert batch.column("amount").to_pylist() == [2, None, 3]
+    assert batch.column("win").to_pylist() == [0, 1, None]
+    assert batch.column("unparsed_values").to_pylist() == [None, [("amount", "1.5")], [("win", "0.9")]]
+
+BOOLEAN_XES = """<?xml version='1.0' encoding='UTF-8'?>
+<log xmlns="http://www.xes-standard.org/">
+  <trace>
+    <string key="concept:name" value="c1"/>
+    <boolean key="win" value="true"/>
+    <event><string key="concept:name" value="Build house"/><int key="amount" value="1"/></event>
+  </trace>
+  <trace>
+    <string key="concept:name" value="c2"/>
+    <event><string key="concept:name" value="Build house"/><boolean key="win" value="FALSE"/></event>
+    <event><string key="concept:name" value="Build house"/><string key="win" value="true"/></event>
+  </trace>
+</log>
+"""
+
+@pytest.mark.parametrize("engine", sorted(extract_xes.PARSERS))
+def test_boolean_flags_become_ints(tmp_path, engine):
+    path = tmp_path / "flags.xes"
+    path.write_text(BOOLEAN_XES, encoding="utf-8")
+    parse, to_batch = extract_xes.PARSERS[engine]
+    batches = []
+    parse(str(path), lambda chunk: batches.append(to_batch(chunk)))
+    assert batches[0].column("win").to_pylist() == [1, 0, 1]
+    assert batches[0].column("amount").to_pylist() == [1, None, None]
+
+MIXED_XES = """<?xml version='1.0' encoding='UTF-8'?>
+<log xmlns="http://www.xes-standard.org/">
+  <trace>
+    <string key="concept:name" value="c1"/>
+    <string key="match_id" value="m1"/>
+    <event><string key="concept:name" value="Build house"/><int key="amount" value="1"/></event>
+    <event><!-- note --><string key="concept:name" value="Queue Villager"/><int key="amount" value="2"/></event>
+    <event><int key="amount" value="3"/><string key="concept:name" value="Build farm"/><int key="amount" value="4"/></event>
+    <event><string key="concept:name" value="Age up"/><list key="skipped"/><int key="@@index" value="7"/></event>
+  </trace>
+  <trace>
+    <string key="concept:name" value="c2"/>
+    <event><string key="concept:name" value="Build house"/><float key="elo" value="1500.5"/></event>
+    <event><string key="concept:name" value="Build house"/><float key="elo" value="1501"/></event>
+  </trace>
+</log>
+"""
+
+def test_fast_engine_matches_legacy_on_mixed_traces(tmp_path):
+    path = tmp_path / "mixed.xes"
+    path.write_text(MIXED_XES, encoding="utf-8")
+    tables = {}
+    for engine, (parse, to_batch) in extract_xes.PARSERS.items():
+        batches = []
+        parse(str(path), lambda chunk: batches.append(to_batch(chunk)))
+        tables[engine] = pa.Table.from_batches(batches).to_pandas()
+    assert tables["fast"].equals(tables["legacy"])
+    assert tables["fast"]["amount"].tolist()[:3] == [1, 2, 4]
+    assert tables["fast"]["event_id"].tolist() == ["c1-0", "c1-1", "c1-2", "c1-7", "c2-0", "c2-1"]
+
+def test_incremental_ingestion(data_dir):
+    def last_batch():
+        return json.loads(extract_xes.MANIFEST_PATH.read_text())["last_batch"]
+
+    extract_xes.main([])
+    assert last_batch()["added_parts"] == ["test_data-0000.parquet"]
+
+    # Nothing changed: nothing is parsed
+    extract_xes.main([])
+    assert last_batch()["added_parts"] == []
+
+    # New file: only it is parsed, existing parts are kept
+    shutil.copy(TEST_XES, data_dir / "second.xes")
+    extract_xes.main([])
+    assert last_batch()["added_parts"] == ["second-0000.parquet"]
+    assert sorted(p.name for p in extract_xes.BRONZE_DIR.glob("*.parquet")) == [
+        "second-0000.parquet", "test_data-0000.parquet"]
+
+    # Deleted file: its parts are dropped
+    (data_dir / "test_data.xes").unlink()
+    extract_xes.main([])
+    assert last_batch()["removed_parts"] == ["test_data-0000.parquet"]
+    assert [p.name for p in extract_xes.BRONZE_DIR.glob("*.parquet")] == ["second-0000.parquet"]
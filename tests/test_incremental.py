@@ -0,0 +1,101 @@
+import os
+import re
+import duckdb
+import pytest
+from pathlib import Path
+
+import extract_xes
+import read_metrics
+import transform_events
+
+REPO = Path(__file__).resolve().parent.parent
+TEST_XES = REPO / "tests" / "test_data.xes"
+
+GOLD_TABLES = ["player_match_facts", "player_match_results", "player_summary", "apm", "age_timings",
+               "openings", "activity_dict", "opening_sequences", "winrate_civ", "winrate_strat",
+               "elo_cube", "filter_dimensions"]
+
+def write_renamed_copy(dst, prefix):
+    """Copy of the test log whose matches and traces get new ids."""
+    text = TEST_XES.read_text(encoding="utf-8")
+    text = text.replace('key="match_id" value="', f'key="match_id" value="{prefix}')
+    text = text.replace('key="concept:name" value="0', f'key="concept:name" value="{prefix}0')
+    dst.write_text(text, encoding="utf-8")
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Empty pipeline workspace (data/, warehouse/, sql/) as the working directory."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "warehouse").mkdir()
+    os.symlink(REPO / "sql", tmp_path / "sql")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def snapshot_gold():
+    con = duckdb.connect(transform_events.WAREHOUSE, read_only=True)
+    tables = {t: con.execute(f"SELECT * FROM gold.{t} ORDER BY ALL").fetchall() for t in GOLD_TABLES}
+    con.close()
+    return tables
+
+def run_pipeline(*flags):
+    extract_xes.main([])
+    transform_events.main(list(flags))
+    read_metrics.main(list(flags))
+
+def test_incremental_refresh_matches_full_rebuild(workspace):
+    write_renamed_copy(workspace / "data" / "a.xes", "a")
+    run_pipeline()
+    write_renamed_copy(workspace / "data" / "b.xes", "b")
+    run_pipeline("--incremental")
+    incremental = snapshot_gold()
+
+    run_pipeline()
+    full = snapshot_gold()
+    assert incremental == full
+    assert len(full["player_match_results"]) == 24
+
+def test_incremental_refresh_merges_late_player_traces(workspace):
+    text = TEST_XES.read_text(encoding="utf-8")
+    traces = re.findall(r"\s*<trace>.*?</trace>", text, flags=re.S)
+    head = text[:text.index(traces[0])]
+    match_ids = re.findall(r'key="match_id" value="([^"]*)"', text)
+    player_ids = re.findall(r'key="player_id" value="([^"]*)"', text)
+    # The last 4 traces arrive later as other players of the first 4 matches;
+    # the first one continues an existing player-match
+    late = [t.replace(match_ids[8 + i], match_ids[i]) for i, t in enumerate(traces[8:])]
+    late[0] = late[0].replace(player_ids[8], player_ids[0])
+
+    (workspace / "data" / "a.xes").write_text(head + "".join(traces[:8]) + "\n</log>\n", encoding="utf-8")
+    run_pipeline()
+    (workspace / "data" / "b.xes").write_text(head + "".join(late) + "\n</log>\n", encoding="utf-8")
+    run_pipeline("--incremental")
+    incremental = snapshot_gold()
+
+    run_pipeline()
+    full = snapshot_gold()
+    assert incremental == full
+    assert len(full["player_match_results"]) == 11
+
+def test_incremental_refresh_applies_every_pending_extract(workspace):
+    write_renamed_copy(workspace / "data" / "a.xes", "a")
+    run_pipeline()
+    # Two extract runs before one transform: both batches are pending
+    write_renamed_copy(workspace / "data" / "b.xes", "b")
+    extract_xes.main([])
+    write_renamed_copy(workspace / "data" / "c.xes", "c")
+    extract_xes.main([])
+    transform_events.main(["--incremental"])
+    read_metrics.main(["--incremental"])
+    incremental = snapshot_gold()
+
+    run_pipeline()
+    assert incremental == snapshot_gold()
+    assert len(incremental["player_match_results"]) == 36
+
+def test_bronze_view_resolves_from_any_directory(workspace, monkeypatch):
+    write_renamed_copy(workspace / "data" / "a.xes", "a")
+    run_pipeline()
+    monkeypatch.chdir(workspace.parent)
+    con = duckdb.connect(str(workspace / transform_events.WAREHOUSE), read_only=True)
+    assert con.execute("SELECT COUNT(*) FROM bronze").fetchone()[0] > 0
+    con.close()
@@ -2,17 +2,17 @@ import duckdb
 import pytest
 from pathlib import Path
 
+import read_metrics
+
 @pytest.fixture(scope="module")
 def con():
     DB = Path("warehouse/aoe.duckdb")
     assert DB.exists(), "DuckDB file missing; run transform_events pipeline first."
     con = duckdb.connect(str(DB))
-    with open("sql/metrics.sql", "r") as f:
-        sql_script = f.read()
     con.execute(f"CREATE SCHEMA IF NOT EXISTS bronze;")
     con.execute(f"CREATE SCHEMA IF NOT EXISTS events_clean;")
     con.execute(f"CREATE SCHEMA IF NOT EXISTS gold;")
-    con.execute(sql_script)
+    read_metrics.refresh_gold(con)
     yield con
     con.close()
 
@@ -35,6 +35,31 @@ def test_openings(con):
     assert expected_cols.issubset(result.columns)
 
 
+def test_opening_sequences(con):
+    result = con.execute("SELECT * FROM gold.opening_sequences LIMIT 1").fetchdf()
+    expected_cols = {"civilization", "civilization_category", "map_type",
+        "strategy", "match_id", "player_id", "elo", "win", "build_order"}
+    assert expected_cols.issubset(result.columns)
+
+    # Decoding the activity codes gives back the exploded openings
+    decoded = con.execute("""
+        SELECT s.match_id, s.player_id, d.activity, s.action_rank
+        FROM (
+            SELECT match_id, player_id, UNNEST(build_order) AS activity_code,
+                UNNEST(RANGE(1, LEN(build_order) + 1)) AS action_rank
+            FROM gold.opening_sequences
+        ) s
+        JOIN gold.activity_dict d USING (activity_code)
+        ORDER BY ALL
+    """).fetchall()
+    exploded = con.execute("""
+        SELECT match_id, player_id, activity, action_rank
+        FROM gold.openings
+        ORDER BY ALL
+    """).fetchall()
+    assert decoded == exploded
+
+
 def test_player_summary(con):
     result = con.execute("SELECT * FROM gold.player_summary LIMIT 1").fetchdf()
     expected_cols = {"player_id", "total_matches", "total_wins", "total_loses", "winrate", "max_elo", "used_strategies"}
@@ -50,3 +75,33 @@ def test_winrate_strat(con):
     expected_cols = {"strategy", "total_games", "winrate", "civilizations"}
     assert expected_cols.issubset(result.columns)
 
+
+def test_filter_dimensions(con):
+    civilizations, min_elo, max_elo = con.execute(
+        "SELECT civilizations, min_elo, max_elo FROM gold.filter_dimensions").fetchone()
+    assert civilizations == [c for (c,) in con.execute(
+        "SELECT DISTINCT civilization FROM events_clean WHERE civilization IS NOT NULL ORDER BY 1").fetchall()]
+    assert (min_elo, max_elo) == con.execute("SELECT MIN(elo), MAX(elo) FROM events_clean").fetchone()
+    assert con.execute("SELECT COUNT(*) FROM gold.warehouse_version").fetchone()[0] == 1
+
+def test_elo_cube_rolls_up_to_facts(con):
+    result = con.execute("SELECT * FROM gold.elo_cube LIMIT 1").fetchdf()
+    expected_cols = {"elo_bucket", "civilization", "map_type", "strategy",
+        "games", "wins", "apm_games", "events_first_600s"}
+    assert expected_cols.issubset(result.columns)
+
+    rolled_up = con.execute("""
+        SELECT civilization, SUM(games), SUM(wins)
+        FROM gold.elo_cube
+        WHERE elo_bucket >= 1000 AND elo_bucket < 2000
+        GROUP BY civilization
+        ORDER BY ALL
+    """).fetchall()
+    direct = con.execute("""
+        SELECT civilization, COUNT(*), COUNT(*) FILTER (WHERE win = 1)
+        FROM gold.player_match_facts
+        WHERE elo >= 1000 AND elo < 2000
+        GROUP BY civilization
+        ORDER BY ALL
+    """).fetchall()
+    assert rolled_up == direct
@@ -0,0 +1,59 @@
+import duckdb
+import pytest
+
+import sync_replica
+
+def refresh_remote(path, players):
+    """Stand-in for the remote warehouse: a gold refresh with the given players."""
+    con = duckdb.connect(str(path))
+    con.execute("CREATE SCHEMA IF NOT EXISTS gold")
+    con.execute("CREATE OR REPLACE TABLE gold.player_summary (player_id VARCHAR, max_elo DOUBLE)")
+    con.executemany("INSERT INTO gold.player_summary VALUES (?, ?)", players)
+    con.execute("CREATE OR REPLACE TABLE gold.activity_dict AS SELECT 1::SMALLINT AS activity_code, 'Build house' AS activity")
+    # Not a dashboard table: stays out of the replica
+    con.execute("CREATE OR REPLACE TABLE gold.civ_stats AS SELECT 'Franks' AS civilization, 1 AS games")
+    con.execute("CREATE OR REPLACE TABLE gold.warehouse_version AS SELECT NOW() AS refreshed_at")
+    con.close()
+
+def sync(remote_path, replica_dir, force=False):
+    remote = duckdb.connect(str(remote_path), read_only=True)
+    try:
+        return sync_replica.sync_replica(remote, replica_dir, force=force)
+    finally:
+        remote.close()
+
+@pytest.fixture
+def remote_path(tmp_path):
+    path = tmp_path / "remote.duckdb"
+    refresh_remote(path, [("a", 1200.0), ("b", 2100.0)])
+    return path
+
+def test_snapshot_copies_dashboard_tables(tmp_path, remote_path):
+    replica_dir = tmp_path / "replica"
+    path = sync(remote_path, replica_dir)
+
+    assert sync_replica.current_snapshot(replica_dir)["path"] == str(path)
+    con = duckdb.connect(str(path), read_only=True)
+    assert con.execute("SELECT * FROM gold.player_summary ORDER BY ALL").fetchall() == [("a", 1200.0), ("b", 2100.0)]
+    assert con.execute("SELECT * FROM gold.activity_dict").fetchall() == [(1, "Build house")]
+    tables = {t for (t,) in con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = 'gold'").fetchall()}
+    assert tables == {"player_summary", "activity_dict", "warehouse_version"}
+    with pytest.raises(duckdb.Error):
+        con.execute("DELETE FROM gold.player_summary")
+    con.close()
+
+def test_snapshot_only_changes_with_version(tmp_path, remote_path):
+    replica_dir = tmp_path / "replica"
+    first = sync(remote_path, replica_dir)
+    assert sync(remote_path, replica_dir) == first
+    assert sync(remote_path, replica_dir, force=True) != first
+
+    # A refresh of the remote is picked up by the next sync, older snapshots are pruned
+    refresh_remote(remote_path, [("c", 3000.0)])
+    latest = sync(remote_path, replica_dir)
+    con = duckdb.connect(str(latest), read_only=True)
+    assert con.execute("SELECT player_id FROM gold.player_summary").fetchall() == [("c",)]
+    con.close()
+    assert not first.exists()
+    assert len(list(replica_dir.glob("aoe-*.duckdb"))) == sync_replica.REPLICA_KEEP
@@ -0,0 +1,32 @@
+import pytest
+from rapidfuzz import fuzz
+
+import scoring
+
+SEQUENCES = [
+    "Queue Villager,Queue Villager,Build house,Build lumber-camp",
+    "Queue Villager,Build house,Queue Villager,Build mill,Build house",
+    "Build barracks,Queue Militia,Queue Militia",
+    ["Build house", "Queue Villager"],
+    "Queue Villager",
+]
+
+def test_score_to_reference_matches_python_loops():
+    references = [1, 1, 0, 2, 4]
+    jaccard, lev = scoring.score_to_reference(SEQUENCES, references)
+
+    actions = [s.split(',') if isinstance(s, str) else s for s in SEQUENCES]
+    for i, r in enumerate(references):
+        a, b = set(actions[i]), set(actions[r])
+        assert jaccard[i] == pytest.approx(len(a & b) / len(a | b))
+        # Edits are counted in whole activities, not characters
+        assert lev[i] == pytest.approx(fuzz.ratio(actions[i], actions[r]) / 100.0, abs=1e-6)
+
+def test_encode_sequences_extends_vocabulary():
+    encoded, vocabulary = scoring.encode_sequences(["a,b", "b,c"])
+    assert encoded == [[0, 1], [1, 2]]
+    encoded, vocabulary = scoring.encode_sequences([["c", "d"]], vocabulary)
+    assert encoded == [[2, 3]]
+    assert vocabulary == {"a": 0, "b": 1, "c": 2, "d": 3}
+    P = scoring.presence_matrix([[0, 0, 1]], 4)
+    assert P.toarray().tolist() == [[1, 1, 0, 0]]